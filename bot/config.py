@@ -1,7 +1,9 @@
 """Environment configuration loading and validation."""
 
+import functools
 import os
 import logging
+import re
 from dataclasses import dataclass
 
 
@@ -10,6 +12,8 @@ LOG_LEVELS = frozenset({"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"})
 
 DEFAULT_TELEGRAM_BOT_API_URL = "http://telegram-bot-api:8081"
 
+_GROUP_ID_RE = re.compile(r"[+-]?\d+")
+
 
 @dataclass(frozen=True)
 class Config:
@@ -20,7 +24,7 @@ class Config:
     google_client_secret: str
     google_refresh_token: str
     telegram_bot_api_url: str
-    allowed_group_ids: tuple[int, ...]
+    allowed_group_ids: frozenset[int]
     db_path: str
     log_level: str
     admin_chat_id: int | None
@@ -64,21 +68,14 @@ def _required(name: str) -> str:
     return value
 
 
-def _allowed_group_ids(raw: str) -> tuple[int, ...]:
-    if not raw.strip():
-        return ()
-    ids: list[int] = []
-    for part in raw.split(","):
-        part = part.strip()
-        if not part:
-            continue
-        try:
-            ids.append(int(part))
-        except ValueError:
-            raise ValueError(
-                f"ALLOWED_GROUP_IDS must be comma-separated integers, got: {part!r}"
-            )
-    return tuple(ids)
+def _allowed_group_ids(raw: str) -> frozenset[int]:
+    parts = [p for p in (part.strip() for part in raw.split(",")) if p]
+    bad = [p for p in parts if not _GROUP_ID_RE.fullmatch(p)]
+    if bad:
+        raise ValueError(
+            f"ALLOWED_GROUP_IDS must be comma-separated integers, got: {bad[0]!r}"
+        )
+    return frozenset(map(int, parts))
 
 
 def _optional_int(name: str) -> int | None:
@@ -100,8 +97,9 @@ def _log_level(raw: str) -> str:
     return value
 
 
+@functools.cache
 def get_log_level_int() -> int:
-    """Return the logging module constant for the configured level."""
+    """Return the logging module constant for the configured level (read once)."""
     level_name = os.environ.get("LOG_LEVEL", "INFO").strip().upper()
     if level_name not in LOG_LEVELS:
         level_name = "INFO"
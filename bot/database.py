@@ -1,16 +1,27 @@
-"""Async SQLite wrapper for processed messages, album cache, and chat title tracking."""
+"""SQLite store for processed messages, album cache, and chat title tracking."""
 
+import asyncio
+import contextlib
 import logging
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Iterable
 from pathlib import Path
 
-import aiosqlite
-
 logger = logging.getLogger(__name__)
 
+# Writes are committed together after this delay, so a burst of messages costs
+# one WAL sync instead of one per statement.
+COMMIT_DELAY_SEC = 0.5
+
+# Recently processed (chat_id, message_id) pairs answered without a query
+PROCESSED_CACHE_SIZE = 4096
+
 _SCHEMA = """
 CREATE TABLE IF NOT EXISTS processed_messages (
     chat_id INTEGER NOT NULL,
     message_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'done',
     PRIMARY KEY (chat_id, message_id)
 );
 
@@ -25,33 +36,125 @@ CREATE TABLE IF NOT EXISTS chat_titles (
 );
 """
 
+# WAL lets writes append to the log instead of rewriting pages, and
+# synchronous=NORMAL only fsyncs at checkpoints — safe in WAL mode.
+_FILE_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA mmap_size=268435456;
+"""
+
+# cache_spill=OFF keeps dirty pages of a debounced transaction in the page
+# cache instead of writing them out before COMMIT.
+_PRAGMAS = """
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA cache_spill=OFF;
+"""
+
 
 class Database:
-    """Async SQLite database for deduplication, album ID cache, and title tracking."""
+    """
+    SQLite database for deduplication, album ID cache, and title tracking.
+
+    Statements run synchronously on the event loop: they are single-row and
+    served from the page cache, so a thread hop per call (as with aiosqlite)
+    costs more than the query. Methods that may commit stay ``async``; the
+    album and title getters only read in-memory caches and are plain methods.
+    """
 
     def __init__(self, db_path: str) -> None:
         self._db_path = db_path
-        self._conn: aiosqlite.Connection | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._dirty = False
+        self._commit_task: asyncio.Task[None] | None = None
+        # Full in-memory mirrors of the small album_cache / chat_titles tables
+        # (one row per group), loaded on open and kept in sync on every write.
+        self._album_cache: dict[str, str] = {}
+        self._title_cache: dict[int, str] = {}
+        # LRU of pairs known to be done; done rows are never deleted, so no invalidation
+        self._processed_cache: OrderedDict[tuple[int, int], None] = OrderedDict()
 
     async def open(self) -> None:
-        """Create parent directory if needed, connect, and initialize schema."""
-        path = Path(self._db_path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-
-        self._conn = await aiosqlite.connect(self._db_path)
-        self._conn.row_factory = aiosqlite.Row
-        await self._conn.executescript(_SCHEMA)
-        await self._conn.commit()
+        """Create parent directory if needed, connect, tune pragmas, and initialize schema."""
+        if self._db_path != ":memory:":
+            Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Every query below is a constant SQL string, so sqlite3's per-connection
+        # statement cache prepares each one once and rebinds it afterwards.
+        self._conn = sqlite3.connect(self._db_path)
+        self._conn.row_factory = sqlite3.Row
+        if self._db_path != ":memory:":
+            self._conn.executescript(_FILE_PRAGMAS)
+        self._conn.executescript(_PRAGMAS)
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        # Claims left behind by a run that stopped mid-upload are retried
+        self._conn.execute("DELETE FROM processed_messages WHERE status = 'pending'")
+        self._conn.commit()
+        self._load_caches()
         logger.info("Database opened path=%s", self._db_path)
 
     async def close(self) -> None:
-        """Close the database connection."""
+        """Flush pending writes and close the database connection."""
+        if self._commit_task is not None:
+            self._commit_task.cancel()
+            self._commit_task = None
         if self._conn:
-            await self._conn.close()
+            await self.commit()
+            self._conn.close()
             self._conn = None
             logger.debug("Database closed")
 
-    def _require_conn(self) -> aiosqlite.Connection:
+    async def clear(self) -> None:
+        """Delete all rows and empty the caches, dropping any pending debounced commit."""
+        if self._commit_task is not None:
+            self._commit_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._commit_task
+            self._commit_task = None
+        self._dirty = False
+        # executescript commits the open transaction before running the deletes
+        self._require_conn().executescript(
+            "DELETE FROM processed_messages; DELETE FROM album_cache; DELETE FROM chat_titles;"
+        )
+        self._album_cache.clear()
+        self._title_cache.clear()
+        self._processed_cache.clear()
+
+    def _load_caches(self) -> None:
+        conn = self._require_conn()
+        self._album_cache = dict(conn.execute("SELECT group_title, album_id FROM album_cache"))
+        self._title_cache = dict(conn.execute("SELECT chat_id, group_title FROM chat_titles"))
+
+    def _migrate(self) -> None:
+        """Add columns introduced after the first release to existing databases."""
+        conn = self._require_conn()
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(processed_messages)")}
+        if "status" not in columns:
+            conn.execute(
+                "ALTER TABLE processed_messages ADD COLUMN status TEXT NOT NULL DEFAULT 'done'"
+            )
+            logger.info("Migrated processed_messages: added status column")
+
+    async def commit(self) -> None:
+        """Commit pending writes now instead of waiting for the debounced commit."""
+        if self._dirty and self._conn is not None:
+            self._dirty = False
+            self._conn.commit()
+
+    def _schedule_commit(self) -> None:
+        self._dirty = True
+        if self._commit_task is None or self._commit_task.done():
+            self._commit_task = asyncio.create_task(self._debounced_commit())
+
+    async def _debounced_commit(self) -> None:
+        # Loop so writes that land while a commit is in flight are not stranded
+        while self._dirty:
+            await asyncio.sleep(COMMIT_DELAY_SEC)
+            await self.commit()
+
+    def _require_conn(self) -> sqlite3.Connection:
         if self._conn is None:
             raise RuntimeError("Database not open; call open() first")
         return self._conn
@@ -61,72 +164,121 @@ class Database:
     async def is_processed(self, chat_id: int, message_id: int) -> bool:
         """Return True if this (chat_id, message_id) has already been processed."""
         conn = self._require_conn()
-        cursor = await conn.execute(
-            "SELECT 1 FROM processed_messages WHERE chat_id = ? AND message_id = ?",
+        if self._processed_cache_hit((chat_id, message_id)):
+            return True
+        row = conn.execute(
+            "SELECT 1 FROM processed_messages "
+            "WHERE chat_id = ? AND message_id = ? AND status = 'done'",
+            (chat_id, message_id),
+        ).fetchone()
+        if row is not None:
+            self._remember_processed((chat_id, message_id))
+        return row is not None
+
+    async def claim_message(self, chat_id: int, message_id: int) -> bool:
+        """
+        Atomically claim this (chat_id, message_id) for processing.
+
+        Returns False if the message is already processed or claimed. A claim
+        is settled by ``mark_processed`` on success or ``release_message``
+        on failure.
+        """
+        conn = self._require_conn()
+        if self._processed_cache_hit((chat_id, message_id)):
+            return False
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO processed_messages (chat_id, message_id, status) "
+            "VALUES (?, ?, 'pending') RETURNING 1",
             (chat_id, message_id),
         )
-        row = await cursor.fetchone()
-        await cursor.close()
+        row = cursor.fetchone()
+        cursor.close()
+        self._schedule_commit()
         return row is not None
 
-    async def mark_processed(self, chat_id: int, message_id: int) -> None:
-        """Record that this (chat_id, message_id) has been processed."""
+    async def release_message(self, chat_id: int, message_id: int) -> None:
+        """Drop a pending claim so the message can be processed again."""
         conn = self._require_conn()
-        await conn.execute(
-            "INSERT OR IGNORE INTO processed_messages (chat_id, message_id) VALUES (?, ?)",
+        conn.execute(
+            "DELETE FROM processed_messages "
+            "WHERE chat_id = ? AND message_id = ? AND status = 'pending'",
             (chat_id, message_id),
         )
-        await conn.commit()
+        self._schedule_commit()
 
-    # ── Album cache ──────────────────────────────────────────────────
+    async def mark_processed(self, chat_id: int, message_id: int) -> None:
+        """Record that this (chat_id, message_id) has been processed."""
+        await self.mark_processed_many([(chat_id, message_id)])
 
-    async def get_album_id(self, group_title: str) -> str | None:
-        """Return the cached Google Photos album ID for this group title, or None."""
+    async def mark_processed_many(self, pairs: Iterable[tuple[int, int]]) -> None:
+        """Record several (chat_id, message_id) pairs as processed in one call."""
         conn = self._require_conn()
-        cursor = await conn.execute(
-            "SELECT album_id FROM album_cache WHERE group_title = ?",
-            (group_title,),
+        pairs = list(pairs)
+        conn.executemany(
+            "INSERT INTO processed_messages (chat_id, message_id, status) "
+            "VALUES (?, ?, 'done') "
+            "ON CONFLICT (chat_id, message_id) DO UPDATE SET status = 'done'",
+            pairs,
         )
-        row = await cursor.fetchone()
-        await cursor.close()
-        return row["album_id"] if row else None
+        for pair in pairs:
+            self._remember_processed(pair)
+        self._schedule_commit()
+
+    def _processed_cache_hit(self, pair: tuple[int, int]) -> bool:
+        if pair in self._processed_cache:
+            self._processed_cache.move_to_end(pair)
+            return True
+        return False
+
+    def _remember_processed(self, pair: tuple[int, int]) -> None:
+        self._processed_cache[pair] = None
+        self._processed_cache.move_to_end(pair)
+        if len(self._processed_cache) > PROCESSED_CACHE_SIZE:
+            self._processed_cache.popitem(last=False)
+
+    # ── Album cache ──────────────────────────────────────────────────
+
+    def get_album_id(self, group_title: str) -> str | None:
+        """Return the cached Google Photos album ID for this group title, or None (no I/O)."""
+        self._require_conn()
+        return self._album_cache.get(group_title)
 
     async def set_album_id(self, group_title: str, album_id: str) -> None:
-        """Store the Google Photos album ID for this group title."""
+        """Store the Google Photos album ID for this group title (committed immediately)."""
         conn = self._require_conn()
-        await conn.execute(
+        conn.execute(
             "INSERT OR REPLACE INTO album_cache (group_title, album_id) VALUES (?, ?)",
             (group_title, album_id),
         )
-        await conn.commit()
+        self._album_cache[group_title] = album_id
+        self._dirty = True
+        await self.commit()
 
     async def delete_album_cache(self, group_title: str) -> None:
         """Remove the cached album entry for this group title."""
         conn = self._require_conn()
-        await conn.execute(
+        conn.execute(
             "DELETE FROM album_cache WHERE group_title = ?",
             (group_title,),
         )
-        await conn.commit()
+        self._album_cache.pop(group_title, None)
+        self._schedule_commit()
 
     # ── Chat title tracking (group rename detection) ─────────────────
 
-    async def get_chat_title(self, chat_id: int) -> str | None:
-        """Return the last-known group title for this chat_id, or None."""
-        conn = self._require_conn()
-        cursor = await conn.execute(
-            "SELECT group_title FROM chat_titles WHERE chat_id = ?",
-            (chat_id,),
-        )
-        row = await cursor.fetchone()
-        await cursor.close()
-        return row["group_title"] if row else None
+    def get_chat_title(self, chat_id: int) -> str | None:
+        """Return the last-known group title for this chat_id, or None (no I/O)."""
+        self._require_conn()
+        return self._title_cache.get(chat_id)
 
     async def set_chat_title(self, chat_id: int, group_title: str) -> None:
-        """Store or update the group title for this chat_id."""
+        """Store or update the group title for this chat_id (no-op if unchanged)."""
         conn = self._require_conn()
-        await conn.execute(
+        if self._title_cache.get(chat_id) == group_title:
+            return
+        conn.execute(
             "INSERT OR REPLACE INTO chat_titles (chat_id, group_title) VALUES (?, ?)",
             (chat_id, group_title),
         )
-        await conn.commit()
+        self._title_cache[chat_id] = group_title
+        self._schedule_commit()
@@ -2,9 +2,14 @@
 
 import asyncio
 import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime, timezone
+from pathlib import Path
 from typing import Any
 
 import httpx
+import orjson
 from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -15,7 +20,25 @@ BASE_URL = "https://photoslibrary.googleapis.com/v1"
 UPLOAD_URL = "https://photoslibrary.googleapis.com/v1/uploads"
 MIN_RETRY_DELAY_SEC = 30  # API doc: 429 requires at least 30s before retry
 MAX_RETRIES = 4
+MAX_RETRY_DELAY_SEC = 120
+# Wait before retry n (1-based): doubles from MIN_RETRY_DELAY_SEC, capped
+RETRY_DELAYS_SEC = tuple(
+    min(MIN_RETRY_DELAY_SEC * 2**attempt, MAX_RETRY_DELAY_SEC)
+    for attempt in range(1, MAX_RETRIES)
+)
+MAX_BATCH_CREATE_ITEMS = 50  # API doc: batchCreate accepts at most 50 newMediaItems
+MAX_ALBUM_TITLE_LENGTH = 500  # API doc: album titles are limited to 500 characters
+MAX_FILENAME_LENGTH = 255
+READ_CHUNK_BYTES = 1024 * 1024  # Files are streamed from disk in 1 MiB reads
+# Files above this size use the resumable protocol so a failed request only
+# resends one chunk; chunks must be a multiple of the 256 KiB granularity.
+RESUMABLE_UPLOAD_THRESHOLD_BYTES = 8 * 1024 * 1024
+RESUMABLE_CHUNK_BYTES = 8 * 1024 * 1024
 RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+TOKEN_EXPIRY_MARGIN_SEC = 60  # Refresh this long before the access token expires
+
+# Both retry loops (whole requests and resumable chunks) wait through this
+_sleep = asyncio.sleep
 
 
 class GooglePhotosError(Exception):
@@ -53,11 +76,36 @@ class GooglePhotosClient:
                 "https://www.googleapis.com/auth/photoslibrary.readonly.appcreateddata",
             ],
         )
-        self._timeout = timeout
+        self._token: str | None = None
+        self._token_expires_at = 0.0  # time.monotonic() deadline for self._token
+        self._token_lock = asyncio.Lock()
+        self._album_index: dict[str, str] | None = None  # title -> album ID
+        self._index_lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client."""
+        await self._client.aclose()
+
+    async def _get_access_token(self, *, force_refresh: bool = False) -> str:
+        """
+        Return a valid access token, refreshing if necessary.
 
-    async def _get_access_token(self) -> str:
-        """Return a valid access token, refreshing if necessary."""
-        if self._credentials.expired or not self._credentials.valid:
+        The token is cached until shortly before it expires; concurrent callers
+        share a single refresh. ``force_refresh`` discards the cached token,
+        e.g. after the API rejected it with 401.
+        """
+        if force_refresh:
+            self._token = None
+        if self._token is not None and time.monotonic() < self._token_expires_at:
+            return self._token
+        async with self._token_lock:
+            if self._token is not None and time.monotonic() < self._token_expires_at:
+                return self._token
             try:
                 await asyncio.to_thread(self._credentials.refresh, Request())
             except RefreshError as exc:
@@ -66,10 +114,18 @@ class GooglePhotosClient:
                     "The refresh token may be expired or revoked. "
                     "Re-run scripts/obtain_token.py to get a new token."
                 ) from exc
-        return self._credentials.token
+            self._token = self._credentials.token
+            self._token_expires_at = (
+                time.monotonic() + self._seconds_until_expiry() - TOKEN_EXPIRY_MARGIN_SEC
+            )
+        return self._token
 
-    def _auth_headers(self, access_token: str) -> dict[str, str]:
-        return {"Authorization": f"Bearer {access_token}"}
+    def _seconds_until_expiry(self) -> float:
+        expiry = self._credentials.expiry  # naive UTC, as used by google-auth
+        if expiry is None:
+            return 0.0
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds()
 
     async def get_or_create_album(self, title: str) -> str:
         """
@@ -84,81 +140,228 @@ class GooglePhotosClient:
         logger.info("Created new album title=%r album_id=%s", title, album_id)
         return album_id
 
+    async def load_album_index(self) -> None:
+        """List all app-created albums once and index them by title."""
+        async with self._index_lock:
+            self._album_index = await self._list_albums()
+        logger.info("Loaded album index albums=%d", len(self._album_index))
+
+    def invalidate_album_index(self) -> None:
+        """Drop the album index so the next lookup re-lists albums from the API."""
+        self._album_index = None
+
     async def _find_album_by_title(self, title: str) -> str | None:
-        page_token: str | None = None
-        async with httpx.AsyncClient(timeout=self._timeout) as client:
-            while True:
-                params: dict[str, Any] = {
-                    "pageSize": 50,
-                    "excludeNonAppCreatedData": True,
-                }
-                if page_token:
-                    params["pageToken"] = page_token
+        # Albums created by this client are added to the index as they are made,
+        # so a loaded index is trusted for the process lifetime until invalidated.
+        async with self._index_lock:
+            if self._album_index is None:
+                self._album_index = await self._list_albums()
+            return self._album_index.get(title)
 
-                resp = await self._request_with_retry(
-                    client,
-                    "GET",
-                    f"{BASE_URL}/albums",
-                    params=params,
-                )
-                data = resp.json()
-                for album in data.get("albums", []):
-                    if album.get("title") == title:
-                        return album["id"]
-                page_token = data.get("nextPageToken")
-                if not page_token:
-                    break
-        return None
+    async def _list_albums(self) -> dict[str, str]:
+        index: dict[str, str] = {}
+        async for data in self._iter_album_pages():
+            for album in data.get("albums", []):
+                if album.get("title"):
+                    index.setdefault(album["title"], album["id"])
+        return index
 
-    async def _create_album(self, title: str) -> str:
-        title_trimmed = title[:500] if len(title) > 500 else title
-        body = {"album": {"title": title_trimmed}}
-        async with httpx.AsyncClient(timeout=self._timeout) as client:
-            resp = await self._request_with_retry(
-                client,
-                "POST",
-                f"{BASE_URL}/albums",
-                json=body,
+    async def _iter_album_pages(self) -> AsyncIterator[dict[str, Any]]:
+        """Yield album list pages, fetching the next page while the caller scans this one."""
+        data = await self._fetch_album_page(None)
+        while True:
+            page_token = data.get("nextPageToken")
+            next_page = (
+                asyncio.create_task(self._fetch_album_page(page_token)) if page_token else None
             )
-        data = resp.json()
+            try:
+                yield data
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+            if next_page is None:
+                return
+            data = await next_page
+
+    async def _fetch_album_page(self, page_token: str | None) -> dict[str, Any]:
+        params: dict[str, Any] = {
+            "pageSize": 50,
+            "excludeNonAppCreatedData": True,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        resp = await self._request_with_retry(
+            self._client,
+            "GET",
+            f"{BASE_URL}/albums",
+            params=params,
+        )
+        return orjson.loads(resp.content)
+
+    async def _create_album(self, title: str) -> str:
+        body = {"album": {"title": title[:MAX_ALBUM_TITLE_LENGTH]}}
+        resp = await self._request_with_retry(
+            self._client,
+            "POST",
+            f"{BASE_URL}/albums",
+            json=body,
+        )
+        data = orjson.loads(resp.content)
         album_id = data.get("id")
         if not album_id:
             raise GooglePhotosError("Create album response missing id", body=resp.text)
+        if self._album_index is not None:
+            self._album_index[title] = album_id
         return album_id
 
     async def upload_media(
         self,
-        file_bytes: bytes,
+        path: Path,
         filename: str,
         mime_type: str,
         album_id: str,
     ) -> None:
-        """Upload media to Google Photos and add it to the given album."""
-        upload_token = await self._upload_bytes(file_bytes, mime_type)
+        """Upload the media file at ``path`` to Google Photos and add it to the given album."""
+        upload_token = await self.upload_file(path, mime_type)
         await self._create_media_item(upload_token, filename, album_id)
 
-    async def _upload_bytes(self, file_bytes: bytes, mime_type: str) -> str:
-        async with httpx.AsyncClient(timeout=self._timeout) as client:
-            resp = await self._request_with_retry(
-                client,
-                "POST",
-                UPLOAD_URL,
-                content=file_bytes,
-                extra_headers={
-                    "Content-type": "application/octet-stream",
-                    "X-Goog-Upload-Content-Type": mime_type,
-                    "X-Goog-Upload-Protocol": "raw",
-                },
-            )
+    async def upload_file(self, path: Path, mime_type: str) -> str:
+        """
+        Upload the media file at ``path`` and return the upload token.
+
+        The token must be passed to ``batch_create_media_items`` to actually
+        create the media item; it stays valid for one day.
+        """
+        size = path.stat().st_size
+        if size > RESUMABLE_UPLOAD_THRESHOLD_BYTES:
+            return await self._upload_file_resumable(path, size, mime_type)
+        resp = await self._request_with_retry(
+            self._client,
+            "POST",
+            UPLOAD_URL,
+            content=lambda: _iter_file(path),
+            extra_headers={
+                "Content-type": "application/octet-stream",
+                "Content-Length": str(size),
+                "X-Goog-Upload-Content-Type": mime_type,
+                "X-Goog-Upload-Protocol": "raw",
+            },
+        )
         return resp.text.strip()
 
+    async def _upload_file_resumable(self, path: Path, size: int, mime_type: str) -> str:
+        """Upload with the resumable protocol, retrying each chunk independently."""
+        resp = await self._request_with_retry(
+            self._client,
+            "POST",
+            UPLOAD_URL,
+            extra_headers={
+                "Content-Length": "0",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Content-Type": mime_type,
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Raw-Size": str(size),
+            },
+        )
+        session_url = resp.headers.get("X-Goog-Upload-URL")
+        if not session_url:
+            raise GooglePhotosError(
+                "Resumable upload start response missing X-Goog-Upload-URL", body=resp.text,
+            )
+
+        offset = 0
+        failures = 0
+        while True:
+            length = min(RESUMABLE_CHUNK_BYTES, size - offset)
+            final = offset + length >= size
+            try:
+                resp = await self._request_with_retry(
+                    self._client,
+                    "POST",
+                    session_url,
+                    content=lambda offset=offset, length=length: _iter_file(path, offset, length),
+                    extra_headers={
+                        "Content-Length": str(length),
+                        "X-Goog-Upload-Command": "upload, finalize" if final else "upload",
+                        "X-Goog-Upload-Offset": str(offset),
+                    },
+                    attempts=1,
+                )
+            except TokenRefreshError:
+                raise
+            except (GooglePhotosError, httpx.TransportError):
+                # The server may have kept part of the failed chunk, so resume
+                # from the offset it reports rather than resending the chunk.
+                failures += 1
+                if failures >= MAX_RETRIES:
+                    raise
+                delay = _retry_delay(failures)
+                logger.warning(
+                    "Resumable chunk failed attempt=%d/%d delay=%ds offset=%d",
+                    failures, MAX_RETRIES - 1, delay, offset,
+                )
+                await _sleep(delay)
+                offset = await self._query_upload_offset(session_url)
+                continue
+            if final:
+                return resp.text.strip()
+            offset += length
+            failures = 0
+
+    async def _query_upload_offset(self, session_url: str) -> int:
+        """Return how many bytes the server has committed for a resumable upload session."""
+        resp = await self._request_with_retry(
+            self._client,
+            "POST",
+            session_url,
+            extra_headers={"Content-Length": "0", "X-Goog-Upload-Command": "query"},
+        )
+        received = resp.headers.get("X-Goog-Upload-Size-Received")
+        if received is None:
+            raise GooglePhotosError(
+                "Resumable upload query response missing X-Goog-Upload-Size-Received",
+                body=resp.text,
+            )
+        return int(received)
+
     async def _create_media_item(
         self,
         upload_token: str,
         filename: str,
         album_id: str,
     ) -> None:
-        filename_safe = filename[:255] if len(filename) > 255 else filename
+        errors, resp = await self._batch_create([(upload_token, filename)], album_id)
+        if errors[0] is not None:
+            raise GooglePhotosError(f"batchCreate failed: {errors[0]}", body=resp.text)
+
+    async def batch_create_media_items(
+        self,
+        items: list[tuple[str, str]],
+        album_id: str,
+    ) -> list[str | None]:
+        """
+        Create media items from ``(upload_token, filename)`` pairs in one
+        ``mediaItems:batchCreate`` request and add them to the given album.
+
+        Returns one entry per item, in order: ``None`` on success, otherwise
+        the error message reported by the API for that item.
+        """
+        if not items:
+            return []
+        errors, _ = await self._batch_create(items, album_id)
+        return errors
+
+    async def _batch_create(
+        self,
+        items: list[tuple[str, str]],
+        album_id: str,
+    ) -> tuple[list[str | None], httpx.Response]:
+        """Run ``mediaItems:batchCreate``; return per-item errors and the raw response."""
+        if len(items) > MAX_BATCH_CREATE_ITEMS:
+            raise ValueError(
+                f"batchCreate accepts at most {MAX_BATCH_CREATE_ITEMS} items, got {len(items)}"
+            )
         body = {
             "albumId": album_id,
             "newMediaItems": [
@@ -166,26 +369,37 @@ class GooglePhotosClient:
                     "description": "",
                     "simpleMediaItem": {
                         "uploadToken": upload_token,
-                        "fileName": filename_safe,
+                        "fileName": filename[:MAX_FILENAME_LENGTH],
                     },
                 }
+                for upload_token, filename in items
             ],
         }
-        async with httpx.AsyncClient(timeout=self._timeout) as client:
-            resp = await self._request_with_retry(
-                client,
-                "POST",
-                f"{BASE_URL}/mediaItems:batchCreate",
-                json=body,
-            )
-        data = resp.json()
+        resp = await self._request_with_retry(
+            self._client,
+            "POST",
+            f"{BASE_URL}/mediaItems:batchCreate",
+            json=body,
+        )
+        data = orjson.loads(resp.content)
         results = data.get("newMediaItemResults", [])
-        if not results:
-            raise GooglePhotosError("batchCreate returned no results", body=resp.text)
-        status = results[0].get("status", {})
-        if status.get("code") and status["code"] != 0:
-            msg = status.get("message", "Unknown error")
-            raise GooglePhotosError(f"batchCreate failed: {msg}", body=resp.text)
+        if len(results) != len(items):
+            raise GooglePhotosError(
+                f"batchCreate returned {len(results)} results for {len(items)} items",
+                body=resp.text,
+            )
+        statuses = {
+            result.get("uploadToken", upload_token): result.get("status", {})
+            for result, (upload_token, _) in zip(results, items)
+        }
+        errors: list[str | None] = []
+        for upload_token, _ in items:
+            status = statuses.get(upload_token, {})
+            if status.get("code") and status["code"] != 0:
+                errors.append(status.get("message", "Unknown error"))
+            else:
+                errors.append(None)
+        return errors, resp
 
     async def _request_with_retry(
         self,
@@ -195,48 +409,62 @@ class GooglePhotosClient:
         *,
         params: dict[str, Any] | None = None,
         json: dict[str, Any] | None = None,
-        content: bytes | None = None,
+        content: bytes | Callable[[], AsyncIterator[bytes]] | None = None,
         extra_headers: dict[str, str] | None = None,
+        attempts: int | None = None,
     ) -> httpx.Response:
         """
         Execute an HTTP request with automatic retry on transient failures.
 
-        Always refreshes the OAuth token on each attempt so retries after token
-        expiry succeed. Caller-provided ``extra_headers`` are merged on every
-        attempt (Authorization is always overwritten with a fresh token).
+        The OAuth token is fetched once per call; if the API answers 401 it is
+        force-refreshed and the request is resent once without waiting.
+        Caller-provided ``extra_headers`` are sent on every attempt
+        (Authorization is always set by this method). A callable ``content``
+        is called on every attempt to get a fresh streaming body, since a
+        consumed stream cannot be resent.
+
+        ``attempts`` caps the number of tries (default ``MAX_RETRIES``), for
+        callers that retry themselves.
         """
+        if attempts is None:
+            attempts = MAX_RETRIES
         last_exc: Exception | None = None
-        delay = MIN_RETRY_DELAY_SEC
+        request_headers = dict(extra_headers) if extra_headers else {}
+        request_headers["Authorization"] = f"Bearer {await self._get_access_token()}"
+        token_refreshed = False
 
-        for attempt in range(MAX_RETRIES):
+        async def send() -> httpx.Response:
+            if json is not None:
+                return await client.request(
+                    method, url, params=params, json=json, headers=request_headers
+                )
+            body = content() if callable(content) else content
+            return await client.request(
+                method, url, params=params, content=body, headers=request_headers
+            )
+
+        for attempt in range(attempts):
             if attempt > 0:
+                delay = _retry_delay(attempt)
                 logger.warning(
                     "Retry attempt=%d/%d delay=%ds method=%s url=%s",
-                    attempt, MAX_RETRIES - 1, delay, method, url,
+                    attempt, attempts - 1, delay, method, url,
                 )
-                await asyncio.sleep(delay)
-
-            token = await self._get_access_token()
-            request_headers = self._auth_headers(token)
-            if extra_headers:
-                request_headers.update(extra_headers)
+                await _sleep(delay)
 
             try:
-                if json is not None:
-                    resp = await client.request(
-                        method, url, params=params, json=json, headers=request_headers
-                    )
-                else:
-                    resp = await client.request(
-                        method, url, params=params, content=content, headers=request_headers
-                    )
+                resp = await send()
+                if resp.status_code == 401 and not token_refreshed:
+                    token_refreshed = True
+                    token = await self._get_access_token(force_refresh=True)
+                    request_headers["Authorization"] = f"Bearer {token}"
+                    resp = await send()
             except httpx.HTTPError as exc:
                 last_exc = exc
                 logger.warning(
                     "HTTP error method=%s url=%s attempt=%d/%d error=%s",
-                    method, url, attempt + 1, MAX_RETRIES, exc,
+                    method, url, attempt + 1, attempts, exc,
                 )
-                delay = min(delay * 2, 120)
                 continue
 
             if resp.status_code in RETRYABLE_STATUS_CODES:
@@ -247,10 +475,8 @@ class GooglePhotosClient:
                 )
                 logger.warning(
                     "Retryable status method=%s url=%s status=%d attempt=%d/%d",
-                    method, url, resp.status_code, attempt + 1, MAX_RETRIES,
+                    method, url, resp.status_code, attempt + 1, attempts,
                 )
-                delay = max(delay, MIN_RETRY_DELAY_SEC)
-                delay = min(delay * 2, 120)
                 continue
 
             resp.raise_for_status()
@@ -259,3 +485,25 @@ class GooglePhotosClient:
         if last_exc:
             raise last_exc
         raise GooglePhotosError("Request failed after retries")
+
+
+def _retry_delay(retry: int) -> int:
+    """Return the wait before retry ``retry`` (1-based), repeating the last delay."""
+    return RETRY_DELAYS_SEC[min(retry, len(RETRY_DELAYS_SEC)) - 1]
+
+
+async def _iter_file(
+    path: Path, offset: int = 0, length: int | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield ``length`` bytes of the file at ``path`` from ``offset`` (default: to EOF)."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = READ_CHUNK_BYTES if remaining is None else min(READ_CHUNK_BYTES, remaining)
+            chunk = await asyncio.to_thread(f.read, size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
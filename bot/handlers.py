@@ -1,68 +1,128 @@
 """Telegram message handlers: sync group media to Google Photos."""
 
+import asyncio
 import logging
-from typing import Any
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import partial
 
-from telegram import ChatMemberUpdated, Update
+from telegram import ChatMemberUpdated, Message, Update
 from telegram.ext import ChatMemberHandler, ContextTypes, MessageHandler, filters
 
-from bot.google_photos import GooglePhotosClient, GooglePhotosError, TokenRefreshError
+from bot.config import Config
+from bot.database import Database
+from bot.google_photos import (
+    MAX_ALBUM_TITLE_LENGTH,
+    MAX_BATCH_CREATE_ITEMS,
+    GooglePhotosClient,
+    GooglePhotosError,
+    TokenRefreshError,
+)
 from bot.media import FileTooLargeError, download_media
 
 logger = logging.getLogger(__name__)
 
 MEDIA_FILTER = filters.PHOTO | filters.VIDEO | filters.VIDEO_NOTE
 
+# Telegram delivers each message of an album separately; wait this long after
+# the last one before creating all of them in a single batchCreate request.
+MEDIA_GROUP_DEBOUNCE_SEC = 2.0
 
-async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+TOKEN_EXPIRED_ADMIN_TEXT = (
+    "\u26a0\ufe0f Google Photos token expired or revoked.\n\n"
+    "All photo uploads are failing. "
+    "Re-run scripts/obtain_token.py to get a new refresh token "
+    "and update GOOGLE_REFRESH_TOKEN in .env, then restart the bot."
+)
+
+
+@dataclass
+class _PendingMediaGroup:
+    """Uploaded-but-not-yet-created items of one Telegram media group."""
+
+    album_id: str
+    chat_title: str
+    flush: Callable[["_PendingMediaGroup"], Awaitable[None]]  # batchCreate + settle claims
+    message_ids: list[int] = field(default_factory=list)
+    items: list[tuple[str, str]] = field(default_factory=list)  # (upload_token, filename)
+    timer: asyncio.TimerHandle | None = None
+
+
+async def handle_media(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    *,
+    db: Database,
+    google_photos: GooglePhotosClient,
+    config: Config,
+) -> None:
     """
     Handle photo, video, or video_note in a group: dedup, download, upload to
     Google Photos album named after the group, mark processed.
 
     Detects group renames and creates new albums for the new title.
-    Skips files that exceed Google Photos size limits.
+    Skips files that exceed Google Photos size limits. Messages that belong to
+    a media group are uploaded immediately but created in one batch once the
+    group is complete.
     """
-    if not update.message or not update.effective_chat:
-        return
-
     message = update.message
-    chat = update.effective_chat
-    chat_id = chat.id
-    message_id = message.id
-
-    if chat.type not in ("group", "supergroup"):
+    if message is None:
         return
-
-    bot_data: dict[str, Any] = context.bot_data
-    db = bot_data.get("db")
-    google_photos: GooglePhotosClient | None = bot_data.get("google_photos")
-    config = bot_data.get("config")
-
-    if not db or not google_photos or not config:
-        logger.error("Handler missing db/google_photos/config in bot_data")
+    chat = update.effective_chat
+    if chat is None or chat.type not in ("group", "supergroup"):
         return
 
+    chat_id = chat.id
     allowed = config.allowed_group_ids
     if allowed and chat_id not in allowed:
         logger.debug("Skipping chat_id=%s (not in ALLOWED_GROUP_IDS)", chat_id)
         return
 
-    if await db.is_processed(chat_id, message_id):
-        logger.debug("Already processed chat_id=%s message_id=%s", chat_id, message_id)
+    message_id = message.id
+
+    if not await db.claim_message(chat_id, message_id):
+        logger.debug(
+            "Already processed or in progress chat_id=%s message_id=%s",
+            chat_id, message_id,
+        )
         return
 
-    chat_title = chat.title or f"Chat_{chat_id}"
+    if not await _sync_media(context, message, chat_id, chat.title, db, google_photos, config):
+        await db.release_message(chat_id, message_id)
+
+
+async def _sync_media(
+    context: ContextTypes.DEFAULT_TYPE,
+    message: Message,
+    chat_id: int,
+    title: str | None,
+    db: Database,
+    google_photos: GooglePhotosClient,
+    config: Config,
+) -> bool:
+    """
+    Download one claimed message and upload it to the group's album.
+
+    Returns False when the message was not synced and its claim should be
+    released; True once it is marked processed or handed off to a media-group
+    batch, which then settles the claim itself.
+    """
+    message_id = message.id
+    chat_title = title or f"Chat_{chat_id}"
     if not chat_title.strip():
         chat_title = f"Chat_{chat_id}"
+    # Truncate once so cache keys match the album title Google Photos stores
+    chat_title = chat_title[:MAX_ALBUM_TITLE_LENGTH]
 
     # Detect group rename: if the stored title differs, invalidate old album cache
-    stored_title = await db.get_chat_title(chat_id)
+    stored_title = db.get_chat_title(chat_id)
     if stored_title and stored_title != chat_title:
         logger.info(
             "Group renamed chat_id=%s old_title=%r new_title=%r",
             chat_id, stored_title, chat_title,
         )
         await db.delete_album_cache(stored_title)
+        google_photos.invalidate_album_index()
     await db.set_chat_title(chat_id, chat_title)
 
     try:
@@ -73,27 +133,43 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             "size=%d limit=%d",
             chat_id, message_id, exc.label, exc.size_bytes, exc.limit_bytes,
         )
-        return
+        return False
     except Exception:
         logger.exception(
             "Failed to download media chat_id=%s message_id=%s", chat_id, message_id,
         )
-        return
+        return False
 
     if not content:
         logger.debug(
             "No supported media chat_id=%s message_id=%s", chat_id, message_id,
         )
-        return
+        return False
 
     try:
-        album_id = await db.get_album_id(chat_title)
+        album_id = db.get_album_id(chat_title)
         if not album_id:
             album_id = await google_photos.get_or_create_album(chat_title)
             await db.set_album_id(chat_title, album_id)
 
+        if message.media_group_id:
+            upload_token = await google_photos.upload_file(content.path, content.mime_type)
+            _buffer_media_group_item(
+                context,
+                (chat_id, message.media_group_id),
+                album_id=album_id,
+                chat_title=chat_title,
+                message_id=message_id,
+                upload_token=upload_token,
+                filename=content.filename,
+                db=db,
+                google_photos=google_photos,
+                config=config,
+            )
+            return True
+
         await google_photos.upload_media(
-            content.data,
+            content.path,
             content.filename,
             content.mime_type,
             album_id,
@@ -103,39 +179,170 @@ async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             "Google OAuth token refresh failed chat_id=%s message_id=%s error=%s",
             chat_id, message_id, exc,
         )
-        admin_chat_id = config.admin_chat_id
-        if admin_chat_id:
-            try:
-                await context.bot.send_message(
-                    chat_id=admin_chat_id,
-                    text=(
-                        "\u26a0\ufe0f Google Photos token expired or revoked.\n\n"
-                        "All photo uploads are failing. "
-                        "Re-run scripts/obtain_token.py to get a new refresh token "
-                        "and update GOOGLE_REFRESH_TOKEN in .env, then restart the bot."
-                    ),
-                )
-            except Exception:
-                logger.exception("Failed to send admin notification")
-        return
+        await _notify_admin_token_expired(context, config.admin_chat_id)
+        return False
     except GooglePhotosError as exc:
         logger.error(
             "Google Photos upload failed chat_id=%s message_id=%s "
             "status=%s error=%s",
             chat_id, message_id, exc.status_code, exc,
         )
-        return
+        return False
     except Exception:
         logger.exception(
             "Upload failed chat_id=%s message_id=%s", chat_id, message_id,
         )
-        return
+        return False
+    finally:
+        content.discard()
 
     await db.mark_processed(chat_id, message_id)
     logger.info(
         "Synced media album=%r chat_id=%s message_id=%s filename=%s",
         chat_title, chat_id, message_id, content.filename,
     )
+    return True
+
+
+def _buffer_media_group_item(
+    context: ContextTypes.DEFAULT_TYPE,
+    key: tuple[int, str],
+    *,
+    album_id: str,
+    chat_title: str,
+    message_id: int,
+    upload_token: str,
+    filename: str,
+    db: Database,
+    google_photos: GooglePhotosClient,
+    config: Config,
+) -> None:
+    """
+    Queue an uploaded media-group item and (re)start the debounce timer.
+
+    The group is flushed when no new item arrived for MEDIA_GROUP_DEBOUNCE_SEC,
+    or immediately once it reaches the batchCreate item limit.
+    """
+    groups: dict[tuple[int, str], _PendingMediaGroup] = context.bot_data.setdefault(
+        "media_groups", {},
+    )
+    pending = groups.get(key)
+    if pending is None:
+        pending = groups[key] = _PendingMediaGroup(
+            album_id=album_id,
+            chat_title=chat_title,
+            flush=partial(_flush_media_group, context, key, db, google_photos, config),
+        )
+    elif pending.timer is not None:
+        pending.timer.cancel()
+
+    pending.message_ids.append(message_id)
+    pending.items.append((upload_token, filename))
+
+    delay = 0 if len(pending.items) >= MAX_BATCH_CREATE_ITEMS else MEDIA_GROUP_DEBOUNCE_SEC
+    pending.timer = asyncio.get_running_loop().call_later(
+        delay, _start_media_group_flush, context, key,
+    )
+
+
+def _start_media_group_flush(context: ContextTypes.DEFAULT_TYPE, key: tuple[int, str]) -> None:
+    pending = context.bot_data.get("media_groups", {}).pop(key, None)
+    if pending is None:
+        return
+    # Tracked here because the application stops awaiting its tasks once
+    # stop() has begun, which is exactly when a late timer may fire.
+    flushes: set[asyncio.Task[None]] = context.bot_data.setdefault("media_group_flushes", set())
+    task = context.application.create_task(pending.flush(pending))
+    flushes.add(task)
+    task.add_done_callback(flushes.discard)
+
+
+async def flush_media_groups(bot_data: dict) -> None:
+    """
+    Create every buffered media group now instead of waiting for its timer.
+
+    Called on shutdown: pending debounce timers never fire once the loop stops,
+    and their updates have already been acknowledged to Telegram. Flushes whose
+    timer already fired are awaited too.
+    """
+    groups: dict[tuple[int, str], _PendingMediaGroup] = bot_data.get("media_groups", {})
+    pending_groups = list(groups.values())
+    groups.clear()
+    for pending in pending_groups:
+        if pending.timer is not None:
+            pending.timer.cancel()
+    in_flight = list(bot_data.get("media_group_flushes", ()))
+    await asyncio.gather(*in_flight, *(pending.flush(pending) for pending in pending_groups))
+
+
+async def _flush_media_group(
+    context: ContextTypes.DEFAULT_TYPE,
+    key: tuple[int, str],
+    db: Database,
+    google_photos: GooglePhotosClient,
+    config: Config,
+    pending: _PendingMediaGroup,
+) -> None:
+    """Create all buffered items of a media group with one batchCreate call."""
+    chat_id, media_group_id = key
+
+    try:
+        errors = await google_photos.batch_create_media_items(
+            pending.items, pending.album_id,
+        )
+    except TokenRefreshError as exc:
+        logger.critical(
+            "Google OAuth token refresh failed chat_id=%s media_group_id=%s error=%s",
+            chat_id, media_group_id, exc,
+        )
+        await _notify_admin_token_expired(context, config.admin_chat_id)
+        errors = None
+    except GooglePhotosError as exc:
+        logger.error(
+            "Google Photos batchCreate failed chat_id=%s media_group_id=%s "
+            "status=%s error=%s",
+            chat_id, media_group_id, exc.status_code, exc,
+        )
+        errors = None
+    except Exception:
+        logger.exception(
+            "batchCreate failed chat_id=%s media_group_id=%s", chat_id, media_group_id,
+        )
+        errors = None
+
+    if errors is None:
+        for message_id in pending.message_ids:
+            await db.release_message(chat_id, message_id)
+        return
+
+    synced: list[tuple[int, str]] = []
+    for message_id, (_, filename), error in zip(pending.message_ids, pending.items, errors):
+        if error is not None:
+            logger.error(
+                "Google Photos media item failed chat_id=%s message_id=%s error=%s",
+                chat_id, message_id, error,
+            )
+            await db.release_message(chat_id, message_id)
+        else:
+            synced.append((message_id, filename))
+
+    await db.mark_processed_many((chat_id, message_id) for message_id, _ in synced)
+    for message_id, filename in synced:
+        logger.info(
+            "Synced media album=%r chat_id=%s message_id=%s filename=%s",
+            pending.chat_title, chat_id, message_id, filename,
+        )
+
+
+async def _notify_admin_token_expired(
+    context: ContextTypes.DEFAULT_TYPE, admin_chat_id: int | None,
+) -> None:
+    if not admin_chat_id:
+        return
+    try:
+        await context.bot.send_message(chat_id=admin_chat_id, text=TOKEN_EXPIRED_ADMIN_TEXT)
+    except Exception:
+        logger.exception("Failed to send admin notification")
 
 
 async def handle_my_chat_member(
@@ -156,9 +363,16 @@ async def handle_my_chat_member(
         )
 
 
-def media_handler() -> MessageHandler[Update, ContextTypes.DEFAULT_TYPE]:
-    """Return a MessageHandler for photo, video, and video_note."""
-    return MessageHandler(MEDIA_FILTER, handle_media)
+def media_handler(
+    db: Database,
+    google_photos: GooglePhotosClient,
+    config: Config,
+) -> MessageHandler[Update, ContextTypes.DEFAULT_TYPE]:
+    """Return a MessageHandler for photo, video, and video_note bound to its dependencies."""
+    return MessageHandler(
+        MEDIA_FILTER,
+        partial(handle_media, db=db, google_photos=google_photos, config=config),
+    )
 
 
 def my_chat_member_handler() -> ChatMemberHandler:
@@ -1,27 +1,28 @@
 """Entry point for the Telegram → Google Photos sync bot."""
 
 import asyncio
+import contextlib
 import logging
+import signal
 import sys
 
+import httpx
 from telegram.ext import ApplicationBuilder
 
 from bot.config import Config, get_log_level_int
 from bot.database import Database
-from bot.google_photos import GooglePhotosClient
-from bot.handlers import media_handler, my_chat_member_handler
+from bot.google_photos import GooglePhotosClient, GooglePhotosError
+from bot.handlers import flush_media_groups, media_handler, my_chat_member_handler
+
+try:
+    import uvloop
+except ImportError:  # optional; not available on Windows
+    uvloop = None
 
 logger = logging.getLogger(__name__)
 
 
 def main() -> None:
-    # Python 3.14+ no longer auto-creates an event loop in the main thread.
-    # Ensure one exists so run_polling()'s internal get_event_loop() succeeds.
-    try:
-        asyncio.get_event_loop()
-    except RuntimeError:
-        asyncio.set_event_loop(asyncio.new_event_loop())
-
     logging.basicConfig(
         level=get_log_level_int(),
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -34,30 +35,43 @@ def main() -> None:
         logger.error("Configuration error: %s", exc)
         sys.exit(1)
 
-    db = Database(config.db_path)
-    google_photos = GooglePhotosClient(
-        client_id=config.google_client_id,
-        client_secret=config.google_client_secret,
-        refresh_token=config.google_refresh_token,
-    )
+    run = uvloop.run if uvloop is not None else asyncio.run
+    run(_run(config))
+
 
-    async def post_init(application) -> None:
-        await db.open()
-        application.bot_data["db"] = db
-        application.bot_data["google_photos"] = google_photos
-        application.bot_data["config"] = config
-        logger.info("Bot started — syncing group media to Google Photos")
+async def _run(config: Config) -> None:
+    """Run the bot until SIGINT/SIGTERM, then shut everything down in order."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):  # not available on Windows
+            loop.add_signal_handler(sig, stop.set)
 
-    async def post_shutdown(_application) -> None:
+    db = Database(config.db_path)
+    await db.open()
+    try:
+        google_photos = GooglePhotosClient(
+            client_id=config.google_client_id,
+            client_secret=config.google_client_secret,
+            refresh_token=config.google_refresh_token,
+        )
+        try:
+            await _run_application(config, db, google_photos, stop)
+        finally:
+            await google_photos.aclose()
+    finally:
         await db.close()
         logger.info("Bot stopped — database closed")
 
-    builder = (
-        ApplicationBuilder()
-        .token(config.telegram_bot_token)
-        .post_init(post_init)
-        .post_shutdown(post_shutdown)
-    )
+
+async def _run_application(
+    config: Config,
+    db: Database,
+    google_photos: GooglePhotosClient,
+    stop: asyncio.Event,
+) -> None:
+    """Poll Telegram until ``stop`` is set, then flush buffered media groups."""
+    builder = ApplicationBuilder().token(config.telegram_bot_token)
     if config.telegram_bot_api_url:
         builder = (
             builder
@@ -65,10 +79,40 @@ def main() -> None:
             .local_mode(True)
         )
     application = builder.build()
-    application.add_handler(media_handler())
+    application.add_handler(media_handler(db, google_photos, config))
     application.add_handler(my_chat_member_handler())
 
-    application.run_polling(allowed_updates=["message", "my_chat_member"])
+    # Warm the album index in the background: it is built lazily on the first
+    # lookup anyway, so a slow or failing API must not delay polling.
+    index_task = asyncio.create_task(_load_album_index(google_photos))
+    try:
+        async with application:
+            await application.start()
+            await application.updater.start_polling(
+                allowed_updates=["message", "my_chat_member"],
+            )
+            logger.info("Bot started — syncing group media to Google Photos")
+            try:
+                await stop.wait()
+            finally:
+                await application.updater.stop()
+                await application.stop()
+                await flush_media_groups(application.bot_data)
+    finally:
+        index_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await index_task
+
+
+async def _load_album_index(google_photos: GooglePhotosClient) -> None:
+    try:
+        await google_photos.load_album_index()
+    except (GooglePhotosError, httpx.HTTPError) as exc:
+        # Not fatal: the index is built lazily on the first album lookup
+        logger.warning("Could not load album index: %s", exc)
+    except Exception:
+        # Anything else (e.g. a non-JSON body) must not surface at shutdown either
+        logger.exception("Could not load album index")
 
 
 if __name__ == "__main__":
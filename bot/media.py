@@ -1,8 +1,11 @@
-"""Download media from Telegram messages (photo, video, video_note) as bytes with metadata."""
+"""Download media from Telegram messages (photo, video, video_note) to temporary files."""
 
 import asyncio
 import logging
+import os
+import tempfile
 from dataclasses import dataclass
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -16,6 +19,7 @@ VIDEO_MAX_BYTES = 10 * 1024 * 1024 * 1024  # 10 GB
 
 MAX_DOWNLOAD_RETRIES = 3
 RETRY_BASE_DELAY_SEC = 2
+_sleep = asyncio.sleep  # wait between download attempts
 
 
 class FileTooLargeError(Exception):
@@ -32,17 +36,28 @@ class FileTooLargeError(Exception):
 
 @dataclass(frozen=True)
 class MediaContent:
-    """Downloaded media: raw bytes plus filename and MIME type for upload."""
+    """Downloaded media: a file on disk plus filename and MIME type for upload."""
 
-    data: bytes
+    path: Path
+    size: int
     filename: str
     mime_type: str
+    temporary: bool = True  # False when ``path`` is the local Bot API server's own file
+
+    def discard(self) -> None:
+        """Delete the file if it is a temporary download."""
+        if self.temporary:
+            self.path.unlink(missing_ok=True)
 
 
 async def download_media(bot: "Bot", message: "Message") -> MediaContent | None:
     """
-    If the message contains a photo, video, or video_note, download it and
-    return bytes plus filename and MIME type. Otherwise return None.
+    If the message contains a photo, video, or video_note, download it to a
+    temporary file and return its path plus filename and MIME type. Otherwise
+    return None. The caller must call ``discard()`` when done with the file.
+
+    With a local Bot API server the file is already on disk and is used in
+    place instead of being copied.
 
     Raises ``FileTooLargeError`` when the file exceeds Google Photos limits.
     """
@@ -55,8 +70,13 @@ async def download_media(bot: "Bot", message: "Message") -> MediaContent | None:
     return None
 
 
-async def _download_with_retry(bot: "Bot", file_id: str) -> tuple["File", bytearray]:
-    """Download a file from Telegram with retry on transient failures."""
+async def _download_with_retry(bot: "Bot", file_id: str, path: Path) -> "File":
+    """
+    Download a file from Telegram to ``path`` with retry on transient failures.
+
+    Nothing is written when the file is served from a local Bot API server's disk;
+    see ``_local_file_path``.
+    """
     last_exc: Exception | None = None
 
     for attempt in range(MAX_DOWNLOAD_RETRIES):
@@ -66,11 +86,12 @@ async def _download_with_retry(bot: "Bot", file_id: str) -> tuple["File", bytear
                 "Telegram download retry attempt=%d/%d delay=%.1fs file_id=%s",
                 attempt + 1, MAX_DOWNLOAD_RETRIES, delay, file_id,
             )
-            await asyncio.sleep(delay)
+            await _sleep(delay)
         try:
             tg_file = await bot.get_file(file_id)
-            data = await tg_file.download_as_bytearray()
-            return tg_file, data
+            if _local_file_path(bot, tg_file) is None:
+                await tg_file.download_to_drive(custom_path=path)
+            return tg_file
         except Exception as exc:
             last_exc = exc
             logger.warning(
@@ -81,6 +102,36 @@ async def _download_with_retry(bot: "Bot", file_id: str) -> tuple["File", bytear
     raise last_exc  # type: ignore[misc]
 
 
+def _local_file_path(bot: "Bot", tg_file: "File") -> Path | None:
+    """Return the file's path if a local Bot API server already has it on our disk."""
+    if not bot.local_mode or not tg_file.file_path:
+        return None
+    path = Path(tg_file.file_path)
+    return path if path.is_file() else None
+
+
+async def _download_to_temp(
+    bot: "Bot", file_id: str,
+) -> tuple["File", Path, int, bool]:
+    """
+    Download a file into a new temporary file; return it with its path, size,
+    and whether that path is the temporary file (False for a local server file).
+    """
+    fd, name = tempfile.mkstemp(prefix="tgmedia_")
+    os.close(fd)
+    path = Path(name)
+    try:
+        tg_file = await _download_with_retry(bot, file_id, path)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    local_path = _local_file_path(bot, tg_file)
+    if local_path is not None:
+        path.unlink(missing_ok=True)
+        return tg_file, local_path, local_path.stat().st_size, False
+    return tg_file, path, path.stat().st_size, True
+
+
 def _check_file_size(file_size: int | None, limit: int, label: str) -> None:
     """Raise ``FileTooLargeError`` if ``file_size`` exceeds ``limit``."""
     if file_size is not None and file_size > limit:
@@ -92,38 +143,37 @@ async def _download_photo(bot: "Bot", photo_sizes: list) -> MediaContent | None:
         return None
     largest = photo_sizes[-1]
     _check_file_size(getattr(largest, "file_size", None), PHOTO_MAX_BYTES, "photo")
-    tg_file, data = await _download_with_retry(bot, largest.file_id)
+    tg_file, path, size, temporary = await _download_to_temp(bot, largest.file_id)
     filename = _safe_filename(tg_file.file_path or "photo.jpg", "photo.jpg")
-    logger.debug("Downloaded photo file_id=%s size=%d", largest.file_id, len(data))
-    return MediaContent(data=bytes(data), filename=filename, mime_type="image/jpeg")
+    logger.debug("Downloaded photo file_id=%s size=%d", largest.file_id, size)
+    return MediaContent(
+        path=path, size=size, filename=filename, mime_type="image/jpeg", temporary=temporary,
+    )
 
 
 async def _download_video(bot: "Bot", video) -> MediaContent | None:
     _check_file_size(getattr(video, "file_size", None), VIDEO_MAX_BYTES, "video")
-    tg_file, data = await _download_with_retry(bot, video.file_id)
+    tg_file, path, size, temporary = await _download_to_temp(bot, video.file_id)
     filename = getattr(video, "file_name", None) or _safe_filename(
         tg_file.file_path or "video.mp4", "video.mp4"
     )
     mime_type = getattr(video, "mime_type", None) or "video/mp4"
-    logger.debug("Downloaded video file_id=%s size=%d", video.file_id, len(data))
-    return MediaContent(data=bytes(data), filename=filename, mime_type=mime_type)
+    logger.debug("Downloaded video file_id=%s size=%d", video.file_id, size)
+    return MediaContent(
+        path=path, size=size, filename=filename, mime_type=mime_type, temporary=temporary,
+    )
 
 
 async def _download_video_note(bot: "Bot", video_note) -> MediaContent | None:
     _check_file_size(getattr(video_note, "file_size", None), VIDEO_MAX_BYTES, "video_note")
-    tg_file, data = await _download_with_retry(bot, video_note.file_id)
+    tg_file, path, size, temporary = await _download_to_temp(bot, video_note.file_id)
     filename = _safe_filename(tg_file.file_path or "video_note.mp4", "video_note.mp4")
-    logger.debug("Downloaded video_note file_id=%s size=%d", video_note.file_id, len(data))
-    return MediaContent(data=bytes(data), filename=filename, mime_type="video/mp4")
+    logger.debug("Downloaded video_note file_id=%s size=%d", video_note.file_id, size)
+    return MediaContent(
+        path=path, size=size, filename=filename, mime_type="video/mp4", temporary=temporary,
+    )
 
 
 def _safe_filename(candidate: str, fallback: str) -> str:
-    """Use candidate if it has a safe extension, otherwise fallback."""
-    candidate = candidate.strip()
-    if not candidate:
-        return fallback
-    if "/" in candidate or "\\" in candidate:
-        candidate = candidate.replace("\\", "/").split("/")[-1]
-    if not candidate:
-        return fallback
-    return candidate
+    """Return the last path component of candidate, or fallback if it is empty."""
+    return os.path.basename(candidate.strip().replace("\\", "/")) or fallback
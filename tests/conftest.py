@@ -1,14 +1,45 @@
 """Shared test fixtures."""
 
+import asyncio
+
 import pytest
+import pytest_asyncio
+from pytest_asyncio import is_async_test
 
 from bot.database import Database
 
+try:
+    import uvloop
+except ImportError:  # optional; not available on Windows
+    uvloop = None
+
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    """Run every async test in one session-wide event loop."""
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy() -> asyncio.AbstractEventLoopPolicy:
+    """Run the test loop on uvloop when it is installed, like bot.main does."""
+    if uvloop is not None:
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
 
-@pytest.fixture
-async def db(tmp_path):
-    """Provide an open in-memory-like SQLite database (on temp disk)."""
-    database = Database(str(tmp_path / "test.db"))
+
+@pytest_asyncio.fixture(scope="session")
+async def _db_session(tmp_path_factory):
+    """Open one SQLite database (on temp disk) shared by the whole test session."""
+    database = Database(str(tmp_path_factory.mktemp("db") / "test.db"))
     await database.open()
     yield database
     await database.close()
+
+
+@pytest_asyncio.fixture
+async def db(_db_session: Database):
+    """Provide the shared database emptied, with no commit left over from the last test."""
+    await _db_session.clear()
+    return _db_session
@@ -0,0 +1,27 @@
+"""Tests for bot.config — environment configuration parsing."""
+
+import pytest
+
+from bot.config import _allowed_group_ids
+
+
+class TestAllowedGroupIds:
+    @pytest.mark.parametrize(
+        ("raw", "expected"),
+        [
+            ("", frozenset()),
+            ("   ", frozenset()),
+            (" , ,", frozenset()),
+            ("-1001234567890", frozenset({-1001234567890})),
+            ("-100, 200 ,,-300", frozenset({-100, 200, -300})),
+            ("+123", frozenset({123})),
+        ],
+        ids=["empty", "whitespace", "empty-parts", "negative", "mixed", "plus-sign"],
+    )
+    def test_parses(self, raw, expected):
+        assert _allowed_group_ids(raw) == expected
+
+    @pytest.mark.parametrize("raw", ["-100,abc", "1_000", "1.5", "--1"])
+    def test_rejects_invalid_entry(self, raw):
+        with pytest.raises(ValueError, match="ALLOWED_GROUP_IDS must be comma-separated integers"):
+            _allowed_group_ids(raw)
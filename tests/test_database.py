@@ -1,4 +1,7 @@
-"""Tests for bot.database — async SQLite wrapper."""
+"""Tests for bot.database — SQLite store."""
+
+import asyncio
+import sqlite3
 
 import pytest
 
@@ -8,15 +11,45 @@ from bot.database import Database
 class TestOpenClose:
     async def test_open_creates_tables(self, db: Database):
         conn = db._require_conn()
-        cursor = await conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
-        )
-        tables = [row["name"] for row in await cursor.fetchall()]
-        await cursor.close()
+        tables = [
+            row["name"]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        ]
         assert "album_cache" in tables
         assert "chat_titles" in tables
         assert "processed_messages" in tables
 
+    async def test_open_enables_wal(self, db: Database):
+        conn = db._require_conn()
+        row = conn.execute("PRAGMA journal_mode").fetchone()
+        assert row[0] == "wal"
+
+    async def test_open_disables_cache_spill(self, db: Database):
+        row = db._require_conn().execute("PRAGMA cache_spill").fetchone()
+        assert row[0] == 0
+
+    async def test_open_in_memory(self):
+        database = Database(":memory:")
+        await database.open()
+        await database.mark_processed(111, 1)
+        assert await database.is_processed(111, 1) is True
+        await database.close()
+
+    async def test_open_migrates_processed_messages(self, tmp_path):
+        path = str(tmp_path / "old.db")
+        with sqlite3.connect(path) as legacy:
+            legacy.execute(
+                "CREATE TABLE processed_messages (chat_id INTEGER NOT NULL, "
+                "message_id INTEGER NOT NULL, PRIMARY KEY (chat_id, message_id))"
+            )
+            legacy.execute("INSERT INTO processed_messages VALUES (111, 1)")
+        legacy.close()
+
+        database = Database(path)
+        await database.open()
+        assert await database.is_processed(111, 1) is True
+        await database.close()
+
     async def test_require_conn_raises_when_not_open(self, tmp_path):
         database = Database(str(tmp_path / "nope.db"))
         with pytest.raises(RuntimeError, match="Database not open"):
@@ -29,6 +62,41 @@ class TestOpenClose:
         await database.close()  # should not raise
 
 
+class TestDeferredCommit:
+    async def test_writes_are_committed_after_delay(self, db: Database, monkeypatch):
+        monkeypatch.setattr("bot.database.COMMIT_DELAY_SEC", 0.01)
+        await db.mark_processed(111, 1)
+        assert db._require_conn().in_transaction
+        await asyncio.sleep(0.1)
+        assert not db._require_conn().in_transaction
+
+    async def test_clear_drops_pending_commit(self, db: Database):
+        await db.mark_processed(111, 1)
+        await db.set_chat_title(111, "Group")
+        await db.clear()
+        assert db._commit_task is None
+        assert not db._require_conn().in_transaction
+        assert await db.is_processed(111, 1) is False
+        assert db.get_chat_title(111) is None
+
+    async def test_set_album_id_commits_immediately(self, db: Database):
+        await db.set_chat_title(111, "Group")
+        await db.set_album_id("Group", "album_1")
+        assert not db._require_conn().in_transaction
+
+    async def test_close_flushes_pending_writes(self, tmp_path):
+        path = str(tmp_path / "flush.db")
+        database = Database(path)
+        await database.open()
+        await database.mark_processed(111, 1)
+        await database.close()
+
+        database = Database(path)
+        await database.open()
+        assert await database.is_processed(111, 1) is True
+        await database.close()
+
+
 class TestProcessedMessages:
     async def test_is_processed_false_for_unknown(self, db: Database):
         assert await db.is_processed(111, 1) is False
@@ -42,49 +110,130 @@ class TestProcessedMessages:
         await db.mark_processed(111, 1)  # INSERT OR IGNORE
         assert await db.is_processed(111, 1) is True
 
+    async def test_mark_processed_many(self, db: Database):
+        await db.claim_message(111, 2)
+        await db.mark_processed_many([(111, 1), (111, 2)])
+        assert await db.is_processed(111, 1) is True
+        assert await db.is_processed(111, 2) is True
+
     async def test_different_messages_are_independent(self, db: Database):
         await db.mark_processed(111, 1)
         assert await db.is_processed(111, 2) is False
         assert await db.is_processed(222, 1) is False
 
 
+class TestClaimMessage:
+    async def test_claim_unknown_message(self, db: Database):
+        assert await db.claim_message(111, 1) is True
+        assert await db.is_processed(111, 1) is False
+
+    async def test_claim_twice_fails(self, db: Database):
+        assert await db.claim_message(111, 1) is True
+        assert await db.claim_message(111, 1) is False
+
+    async def test_claim_processed_message_fails(self, db: Database):
+        await db.mark_processed(111, 1)
+        assert await db.claim_message(111, 1) is False
+
+    async def test_mark_processed_settles_claim(self, db: Database):
+        await db.claim_message(111, 1)
+        await db.mark_processed(111, 1)
+        assert await db.is_processed(111, 1) is True
+
+    async def test_release_allows_reclaim(self, db: Database):
+        await db.claim_message(111, 1)
+        await db.release_message(111, 1)
+        assert await db.claim_message(111, 1) is True
+
+    async def test_release_keeps_processed(self, db: Database):
+        await db.mark_processed(111, 1)
+        await db.release_message(111, 1)
+        assert await db.is_processed(111, 1) is True
+
+    async def test_processed_pairs_answered_from_cache(self, db: Database):
+        await db.mark_processed(111, 1)
+        db._require_conn().execute("DELETE FROM processed_messages")
+        assert await db.is_processed(111, 1) is True
+        assert await db.claim_message(111, 1) is False
+
+    async def test_processed_cache_is_bounded(self, db: Database, monkeypatch):
+        monkeypatch.setattr("bot.database.PROCESSED_CACHE_SIZE", 2)
+        await db.mark_processed_many([(111, 1), (111, 2), (111, 3)])
+        assert list(db._processed_cache) == [(111, 2), (111, 3)]
+        assert await db.is_processed(111, 1) is True  # falls back to the table
+
+    async def test_reopen_drops_stale_claims(self, tmp_path):
+        path = str(tmp_path / "claims.db")
+        database = Database(path)
+        await database.open()
+        await database.claim_message(111, 1)
+        await database.close()
+
+        database = Database(path)
+        await database.open()
+        assert await database.claim_message(111, 1) is True
+        await database.close()
+
+
 class TestAlbumCache:
     async def test_get_album_id_returns_none_for_unknown(self, db: Database):
-        assert await db.get_album_id("unknown") is None
+        assert db.get_album_id("unknown") is None
 
     async def test_set_and_get_album_id(self, db: Database):
         await db.set_album_id("My Group", "album_123")
-        assert await db.get_album_id("My Group") == "album_123"
+        assert db.get_album_id("My Group") == "album_123"
 
     async def test_set_album_id_overwrites(self, db: Database):
         await db.set_album_id("My Group", "album_old")
         await db.set_album_id("My Group", "album_new")
-        assert await db.get_album_id("My Group") == "album_new"
+        assert db.get_album_id("My Group") == "album_new"
 
     async def test_delete_album_cache(self, db: Database):
         await db.set_album_id("Old Name", "album_x")
         await db.delete_album_cache("Old Name")
-        assert await db.get_album_id("Old Name") is None
+        assert db.get_album_id("Old Name") is None
 
     async def test_delete_album_cache_no_op_for_missing(self, db: Database):
         await db.delete_album_cache("nonexistent")  # should not raise
 
 
+class TestCacheWarmup:
+    async def test_titles_and_albums_loaded_on_open(self, tmp_path):
+        path = str(tmp_path / "warm.db")
+        database = Database(path)
+        await database.open()
+        await database.set_chat_title(111, "Friends")
+        await database.set_album_id("Friends", "album_1")
+        await database.close()
+
+        database = Database(path)
+        await database.open()
+        assert database.get_chat_title(111) == "Friends"
+        assert database.get_album_id("Friends") == "album_1"
+        await database.close()
+
+    async def test_unchanged_title_skips_write(self, db: Database):
+        await db.set_chat_title(111, "Friends")
+        await db.commit()
+        await db.set_chat_title(111, "Friends")
+        assert not db._require_conn().in_transaction
+
+
 class TestChatTitles:
     async def test_get_chat_title_returns_none_for_unknown(self, db: Database):
-        assert await db.get_chat_title(999) is None
+        assert db.get_chat_title(999) is None
 
     async def test_set_and_get_chat_title(self, db: Database):
         await db.set_chat_title(111, "Friends")
-        assert await db.get_chat_title(111) == "Friends"
+        assert db.get_chat_title(111) == "Friends"
 
     async def test_set_chat_title_overwrites(self, db: Database):
         await db.set_chat_title(111, "Old Name")
         await db.set_chat_title(111, "New Name")
-        assert await db.get_chat_title(111) == "New Name"
+        assert db.get_chat_title(111) == "New Name"
 
     async def test_different_chats_are_independent(self, db: Database):
         await db.set_chat_title(111, "Chat A")
         await db.set_chat_title(222, "Chat B")
-        assert await db.get_chat_title(111) == "Chat A"
-        assert await db.get_chat_title(222) == "Chat B"
+        assert db.get_chat_title(111) == "Chat A"
+        assert db.get_chat_title(222) == "Chat B"
@@ -1,5 +1,8 @@
 """Tests for bot.google_photos — Google Photos API client."""
 
+import asyncio
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -11,11 +14,29 @@ from bot.google_photos import (
     GooglePhotosClient,
     GooglePhotosError,
     TokenRefreshError,
+    MAX_BATCH_CREATE_ITEMS,
     MAX_RETRIES,
     RETRYABLE_STATUS_CODES,
+    RETRY_DELAYS_SEC,
 )
 
 
+@pytest.fixture(scope="module", autouse=True)
+def _stub_credentials():
+    """Replace google.oauth2 Credentials once for the module; token refresh is mocked per test."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("bot.google_photos.Credentials", MagicMock())
+        yield
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch) -> AsyncMock:
+    """Record API back-off waits instead of sitting through the 60-120 s schedule."""
+    sleep = AsyncMock()
+    monkeypatch.setattr("bot.google_photos._sleep", sleep)
+    return sleep
+
+
 # ── GooglePhotosError ────────────────────────────────────────────────
 
 
@@ -55,28 +76,101 @@ class TestTokenRefreshError:
             await client._get_access_token()
 
 
+class TestAccessTokenCache:
+    def _client_with_refresh(self, lifetime_sec: float) -> tuple[GooglePhotosClient, MagicMock]:
+        client = _make_client()
+        creds = MagicMock()
+        creds.token = None
+
+        def refresh(_request):
+            creds.token = f"token_{creds.refresh.call_count}"
+            creds.expiry = (
+                datetime.now(timezone.utc).replace(tzinfo=None)
+                + timedelta(seconds=lifetime_sec)
+            )
+
+        creds.refresh.side_effect = refresh
+        client._credentials = creds
+        return client, creds
+
+    @patch("bot.google_photos.Request")
+    async def test_reuses_token_until_expiry(self, _mock_request):
+        client, creds = self._client_with_refresh(3600)
+
+        assert await client._get_access_token() == "token_1"
+        assert await client._get_access_token() == "token_1"
+        assert creds.refresh.call_count == 1
+
+    @patch("bot.google_photos.Request")
+    async def test_refreshes_token_near_expiry(self, _mock_request):
+        client, creds = self._client_with_refresh(30)  # inside the 60s margin
+
+        await client._get_access_token()
+        await client._get_access_token()
+        assert creds.refresh.call_count == 2
+
+    @patch("bot.google_photos.Request")
+    async def test_concurrent_callers_share_one_refresh(self, _mock_request):
+        client, creds = self._client_with_refresh(3600)
+
+        tokens = await asyncio.gather(*(client._get_access_token() for _ in range(5)))
+        assert tokens == ["token_1"] * 5
+        assert creds.refresh.call_count == 1
+
+    @patch("bot.google_photos.Request")
+    async def test_force_refresh_discards_cached_token(self, _mock_request):
+        client, creds = self._client_with_refresh(3600)
+
+        assert await client._get_access_token() == "token_1"
+        assert await client._get_access_token(force_refresh=True) == "token_2"
+        assert creds.refresh.call_count == 2
+
+
 # ── Helpers ──────────────────────────────────────────────────────────
 
 
 def _make_client() -> GooglePhotosClient:
     """Create a client with dummy credentials (token refresh will be mocked)."""
-    with patch("bot.google_photos.Credentials"):
-        client = GooglePhotosClient(
-            client_id="cid",
-            client_secret="csecret",
-            refresh_token="rtoken",
-        )
-    return client
+    return GooglePhotosClient(client_id="cid", client_secret="csecret", refresh_token="rtoken")
+
 
+def _scripted_client(
+    *outcomes: httpx.Response | Exception,
+) -> tuple[httpx.AsyncClient, list[httpx.Request]]:
+    """
+    Real AsyncClient over a MockTransport that answers the n-th request with
+    ``outcomes[n]``. Requests past the end get the last outcome, so a single
+    503 scripts a persistent outage. Sent requests are collected for inspection.
+    """
+    requests: list[httpx.Request] = []
 
-def _mock_response(status_code: int = 200, json_data: dict | None = None, text: str = "") -> MagicMock:
-    resp = MagicMock(spec=httpx.Response)
-    resp.status_code = status_code
-    resp.text = text or ""
-    if json_data is not None:
-        resp.json.return_value = json_data
-    resp.raise_for_status = MagicMock()
-    return resp
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        outcome = outcomes[min(len(requests), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+
+# ── HTTP client lifecycle ────────────────────────────────────────────
+
+
+class TestHttpClient:
+    async def test_client_is_shared_and_closed(self):
+        client = _make_client()
+        http_client = client._client
+        assert isinstance(http_client, httpx.AsyncClient)
+
+        client._request_with_retry = AsyncMock(return_value=httpx.Response(200, json={"id": "a"}))
+        await client._create_album("One")
+        await client._create_album("Two")
+        for call in client._request_with_retry.call_args_list:
+            assert call.args[0] is http_client
+
+        await client.aclose()
+        assert http_client.is_closed
 
 
 # ── _request_with_retry ─────────────────────────────────────────────
@@ -86,90 +180,71 @@ class TestRequestWithRetry:
     async def test_success_on_first_attempt(self):
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="token_abc")
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        resp = _mock_response(200, {"ok": True})
-        http_client.request.return_value = resp
+        http_client, requests = _scripted_client(httpx.Response(200, json={"ok": True}))
 
         result = await client._request_with_retry(
             http_client, "GET", "https://example.com/api",
         )
-        assert result is resp
-        http_client.request.assert_called_once()
+        assert result.status_code == 200
+        assert len(requests) == 1
 
-    @patch("bot.google_photos.MIN_RETRY_DELAY_SEC", 0)
     async def test_retries_on_429(self):
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="token")
-
-        resp_429 = _mock_response(429, text="rate limited")
-        resp_ok = _mock_response(200, {"ok": True})
-
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.side_effect = [resp_429, resp_ok]
+        http_client, requests = _scripted_client(
+            httpx.Response(429, text="rate limited"),
+            httpx.Response(200, json={"ok": True}),
+        )
 
         result = await client._request_with_retry(
             http_client, "GET", "https://example.com/api",
         )
-        assert result is resp_ok
-        assert http_client.request.call_count == 2
+        assert result.status_code == 200
+        assert len(requests) == 2
 
-    @patch("bot.google_photos.MIN_RETRY_DELAY_SEC", 0)
     async def test_retries_on_500(self):
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="token")
-
-        resp_500 = _mock_response(500, text="server error")
-        resp_ok = _mock_response(200, {"ok": True})
-
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.side_effect = [resp_500, resp_ok]
+        http_client, _ = _scripted_client(
+            httpx.Response(500, text="server error"),
+            httpx.Response(200, json={"ok": True}),
+        )
 
         result = await client._request_with_retry(
             http_client, "POST", "https://example.com/api",
         )
-        assert result is resp_ok
+        assert result.status_code == 200
 
-    @patch("bot.google_photos.MIN_RETRY_DELAY_SEC", 0)
     async def test_retries_on_network_error(self):
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="token")
-
-        resp_ok = _mock_response(200, {"ok": True})
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.side_effect = [
+        http_client, _ = _scripted_client(
             httpx.ConnectError("connection refused"),
-            resp_ok,
-        ]
+            httpx.Response(200, json={"ok": True}),
+        )
 
         result = await client._request_with_retry(
             http_client, "GET", "https://example.com/api",
         )
-        assert result is resp_ok
+        assert result.status_code == 200
 
-    @patch("bot.google_photos.MIN_RETRY_DELAY_SEC", 0)
-    @patch("bot.google_photos.MAX_RETRIES", 2)
-    async def test_raises_after_exhausted_retries(self):
+    async def test_raises_after_exhausted_retries(self, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.MAX_RETRIES", 2)
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="token")
-
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.side_effect = httpx.ConnectError("down")
+        http_client, requests = _scripted_client(httpx.ConnectError("down"))
 
         with pytest.raises(httpx.ConnectError):
             await client._request_with_retry(
                 http_client, "GET", "https://example.com/api",
             )
-        assert http_client.request.call_count == 2
+        assert len(requests) == 2
 
-    @patch("bot.google_photos.MIN_RETRY_DELAY_SEC", 0)
-    @patch("bot.google_photos.MAX_RETRIES", 2)
-    async def test_raises_google_photos_error_after_retryable_status_exhausted(self):
+    async def test_raises_google_photos_error_after_retryable_status_exhausted(self, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.MAX_RETRIES", 2)
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="token")
-
-        resp_503 = _mock_response(503, text="unavailable")
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.return_value = resp_503
+        http_client, _ = _scripted_client(httpx.Response(503, text="unavailable"))
 
         with pytest.raises(GooglePhotosError) as exc_info:
             await client._request_with_retry(
@@ -177,31 +252,66 @@ class TestRequestWithRetry:
             )
         assert exc_info.value.status_code == 503
 
-    async def test_refreshes_token_on_each_attempt(self):
+    async def test_backs_off_on_precomputed_schedule(self, fast_retry: AsyncMock):
         client = _make_client()
-        tokens = iter(["token_1", "token_2"])
-        client._get_access_token = AsyncMock(side_effect=tokens)
-
-        resp_429 = _mock_response(429, text="rate limited")
-        resp_ok = _mock_response(200, {"ok": True})
-
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.side_effect = [resp_429, resp_ok]
+        client._get_access_token = AsyncMock(return_value="token")
+        http_client, _ = _scripted_client(httpx.Response(429, text="rate limited"))
 
-        with patch("bot.google_photos.MIN_RETRY_DELAY_SEC", 0):
+        with pytest.raises(GooglePhotosError):
             await client._request_with_retry(
                 http_client, "GET", "https://example.com/api",
             )
 
-        assert client._get_access_token.call_count == 2
+        assert [c.args[0] for c in fast_retry.await_args_list] == list(RETRY_DELAYS_SEC)
+        assert RETRY_DELAYS_SEC == (60, 120, 120)
+
+    async def test_more_retries_than_schedule_reuse_last_delay(self, fast_retry, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.MAX_RETRIES", 6)
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="token")
+        http_client, requests = _scripted_client(httpx.Response(503, text="unavailable"))
+
+        with pytest.raises(GooglePhotosError, match="503"):
+            await client._request_with_retry(http_client, "GET", "https://example.com/api")
+
+        assert len(requests) == 6
+        assert [c.args[0] for c in fast_retry.await_args_list] == [60, 120, 120, 120, 120]
+
+    async def test_fetches_token_once_across_retries(self):
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="token_1")
+        http_client, _ = _scripted_client(
+            httpx.Response(429, text="rate limited"),
+            httpx.Response(200, json={"ok": True}),
+        )
+
+        await client._request_with_retry(
+            http_client, "GET", "https://example.com/api",
+        )
+
+        client._get_access_token.assert_awaited_once_with()
+
+    async def test_refreshes_token_once_on_401(self, fast_retry: AsyncMock):
+        client = _make_client()
+        client._get_access_token = AsyncMock(side_effect=["stale", "fresh"])
+        http_client, requests = _scripted_client(
+            httpx.Response(401, text="unauthorized"),
+            httpx.Response(200, json={"ok": True}),
+        )
+
+        result = await client._request_with_retry(
+            http_client, "GET", "https://example.com/api",
+        )
+
+        assert result.status_code == 200
+        fast_retry.assert_not_called()
+        client._get_access_token.assert_awaited_with(force_refresh=True)
+        assert requests[-1].headers["Authorization"] == "Bearer fresh"
 
     async def test_extra_headers_merged(self):
         client = _make_client()
         client._get_access_token = AsyncMock(return_value="tok")
-
-        resp_ok = _mock_response(200, {"ok": True})
-        http_client = AsyncMock(spec=httpx.AsyncClient)
-        http_client.request.return_value = resp_ok
+        http_client, requests = _scripted_client(httpx.Response(200, json={"ok": True}))
 
         await client._request_with_retry(
             http_client, "POST", "https://example.com/upload",
@@ -209,16 +319,15 @@ class TestRequestWithRetry:
             extra_headers={"X-Custom": "value"},
         )
 
-        call_kwargs = http_client.request.call_args
-        headers = call_kwargs.kwargs.get("headers") or call_kwargs[1].get("headers")
+        headers = requests[0].headers
         assert headers["Authorization"] == "Bearer tok"
         assert headers["X-Custom"] == "value"
 
 
 class TestRetryableStatusCodes:
-    @pytest.mark.parametrize("code", [429, 500, 502, 503, 504])
-    def test_status_code_is_retryable(self, code):
-        assert code in RETRYABLE_STATUS_CODES
+    def test_transient_status_codes_are_retryable(self):
+        assert isinstance(RETRYABLE_STATUS_CODES, frozenset)
+        assert {429, 500, 502, 503, 504} <= RETRYABLE_STATUS_CODES
 
 
 # ── Album operations ─────────────────────────────────────────────────
@@ -244,15 +353,230 @@ class TestGetOrCreateAlbum:
         client._create_album.assert_called_once_with("New Album")
 
 
+class TestFindAlbumByTitle:
+    def _paged_client(self, pages: list[dict]) -> tuple[GooglePhotosClient, list[str | None]]:
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="tok")
+        requested: list[str | None] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            page_token = request.url.params.get("pageToken")
+            requested.append(page_token)
+            return httpx.Response(200, json=pages[int(page_token or 0)])
+
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client, requested
+
+    async def test_finds_album_on_later_page(self):
+        client, requested = self._paged_client([
+            {"albums": [{"id": "a1", "title": "One"}], "nextPageToken": "1"},
+            {"albums": [{"id": "a2", "title": "Two"}]},
+        ])
+        assert await client._find_album_by_title("Two") == "a2"
+        assert requested == [None, "1"]
+
+    async def test_second_lookup_served_from_index(self):
+        client, requested = self._paged_client([
+            {"albums": [{"id": "a1", "title": "One"}, {"id": "a2", "title": "Two"}]},
+        ])
+        assert await client._find_album_by_title("One") == "a1"
+        assert await client._find_album_by_title("Two") == "a2"
+        assert requested == [None]
+
+    async def test_load_album_index_then_created_album_indexed(self):
+        client, requested = self._paged_client([{"albums": []}])
+        await client.load_album_index()
+        client._request_with_retry = AsyncMock(return_value=httpx.Response(200, json={"id": "new"}))
+
+        assert await client._create_album("Fresh") == "new"
+        assert await client._find_album_by_title("Fresh") == "new"
+        assert requested == [None]
+
+    async def test_missing_title_does_not_relist_loaded_index(self):
+        client, requested = self._paged_client([{"albums": [{"id": "a1", "title": "One"}]}])
+        await client.load_album_index()
+        assert await client._find_album_by_title("Missing") is None
+        assert requested == [None]
+
+    async def test_invalidated_index_is_relisted(self):
+        client, requested = self._paged_client([{"albums": [{"id": "a1", "title": "One"}]}])
+        assert await client._find_album_by_title("One") == "a1"
+        client.invalidate_album_index()
+        assert await client._find_album_by_title("One") == "a1"
+        assert requested == [None, None]
+
+    async def test_returns_none_when_missing(self):
+        client, requested = self._paged_client([
+            {"albums": [{"id": "a1", "title": "One"}], "nextPageToken": "1"},
+            {"albums": []},
+        ])
+        assert await client._find_album_by_title("Missing") is None
+        assert requested == [None, "1"]
+
+
 class TestUploadMedia:
-    async def test_upload_calls_both_steps(self):
+    async def test_upload_calls_both_steps(self, tmp_path):
         client = _make_client()
-        client._upload_bytes = AsyncMock(return_value="upload_token_abc")
+        client.upload_file = AsyncMock(return_value="upload_token_abc")
         client._create_media_item = AsyncMock()
+        path = tmp_path / "file.jpg"
 
-        await client.upload_media(b"bytes", "file.jpg", "image/jpeg", "album_1")
+        await client.upload_media(path, "file.jpg", "image/jpeg", "album_1")
 
-        client._upload_bytes.assert_called_once_with(b"bytes", "image/jpeg")
+        client.upload_file.assert_called_once_with(path, "image/jpeg")
         client._create_media_item.assert_called_once_with(
             "upload_token_abc", "file.jpg", "album_1",
         )
+
+    async def test_upload_file_streams_from_disk(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.READ_CHUNK_BYTES", 4)
+        path = tmp_path / "file.jpg"
+        path.write_bytes(b"0123456789")
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="tok")
+        received: list[bytes] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            received.append(await request.aread())
+            assert request.headers["Content-Length"] == "10"
+            return httpx.Response(200, text="upload_token_abc\n")
+
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        token = await client.upload_file(path, "image/jpeg")
+
+        assert token == "upload_token_abc"
+        assert received == [b"0123456789"]
+
+
+class TestResumableUpload:
+    async def test_large_file_uploaded_in_chunks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.RESUMABLE_UPLOAD_THRESHOLD_BYTES", 8)
+        monkeypatch.setattr("bot.google_photos.RESUMABLE_CHUNK_BYTES", 4)
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"0123456789")
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="tok")
+        chunks: list[tuple[str, str, bytes]] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            command = request.headers["X-Goog-Upload-Command"]
+            if command == "start":
+                assert request.headers["X-Goog-Upload-Raw-Size"] == "10"
+                return httpx.Response(
+                    200, headers={"X-Goog-Upload-URL": "https://upload.example/session"},
+                )
+            assert str(request.url) == "https://upload.example/session"
+            body = await request.aread()
+            chunks.append((command, request.headers["X-Goog-Upload-Offset"], body))
+            return httpx.Response(200, text="upload_token_big" if "finalize" in command else "")
+
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        token = await client.upload_file(path, "video/mp4")
+
+        assert token == "upload_token_big"
+        assert chunks == [
+            ("upload", "0", b"0123"),
+            ("upload", "4", b"4567"),
+            ("upload, finalize", "8", b"89"),
+        ]
+
+    async def test_chunk_retried_without_resending_earlier_chunks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.RESUMABLE_UPLOAD_THRESHOLD_BYTES", 4)
+        monkeypatch.setattr("bot.google_photos.RESUMABLE_CHUNK_BYTES", 4)
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"01234567")
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="tok")
+        offsets: list[str] = []
+        failed = False
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal failed
+            command = request.headers["X-Goog-Upload-Command"]
+            if command == "start":
+                return httpx.Response(200, headers={"X-Goog-Upload-URL": "https://u.example/s"})
+            if command == "query":
+                return httpx.Response(200, headers={"X-Goog-Upload-Size-Received": "4"})
+            offsets.append(request.headers["X-Goog-Upload-Offset"])
+            await request.aread()
+            if offsets[-1] == "4" and not failed:
+                failed = True
+                return httpx.Response(503)
+            return httpx.Response(200, text="tok_final")
+
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert await client.upload_file(path, "video/mp4") == "tok_final"
+        assert offsets == ["0", "4", "4"]
+
+    async def test_transport_error_resumes_from_server_offset(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("bot.google_photos.RESUMABLE_UPLOAD_THRESHOLD_BYTES", 4)
+        monkeypatch.setattr("bot.google_photos.RESUMABLE_CHUNK_BYTES", 4)
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"01234567")
+        client = _make_client()
+        client._get_access_token = AsyncMock(return_value="tok")
+        chunks: list[tuple[str, bytes]] = []
+        failed = False
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal failed
+            command = request.headers["X-Goog-Upload-Command"]
+            if command == "start":
+                return httpx.Response(200, headers={"X-Goog-Upload-URL": "https://u.example/s"})
+            if command == "query":
+                # The connection dropped after the server kept 2 bytes of the chunk at 4
+                return httpx.Response(200, headers={
+                    "X-Goog-Upload-Status": "active", "X-Goog-Upload-Size-Received": "6",
+                })
+            chunks.append((request.headers["X-Goog-Upload-Offset"], await request.aread()))
+            if chunks[-1][0] == "4" and not failed:
+                failed = True
+                raise httpx.WriteError("connection reset mid-chunk")
+            return httpx.Response(200, text="tok_final")
+
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert await client.upload_file(path, "video/mp4") == "tok_final"
+        assert chunks == [("0", b"0123"), ("4", b"4567"), ("6", b"67")]
+
+
+class TestBatchCreateMediaItems:
+    async def test_posts_all_items_in_one_request(self):
+        client = _make_client()
+        resp = httpx.Response(200, json={
+            "newMediaItemResults": [
+                {"uploadToken": "tok_a", "status": {"message": "Success"}},
+                {"uploadToken": "tok_b", "status": {"code": 3, "message": "Invalid"}},
+            ],
+        })
+        client._request_with_retry = AsyncMock(return_value=resp)
+
+        errors = await client.batch_create_media_items(
+            [("tok_a", "a.jpg"), ("tok_b", "b.jpg")], "album_1",
+        )
+
+        assert errors == [None, "Invalid"]
+        client._request_with_retry.assert_called_once()
+        body = client._request_with_retry.call_args.kwargs["json"]
+        assert body["albumId"] == "album_1"
+        assert [i["simpleMediaItem"]["uploadToken"] for i in body["newMediaItems"]] == [
+            "tok_a", "tok_b",
+        ]
+
+    async def test_single_item_failure_keeps_response_body(self):
+        client = _make_client()
+        resp = httpx.Response(200, json={
+            "newMediaItemResults": [
+                {"uploadToken": "tok_a", "status": {"code": 3, "message": "Invalid"}},
+            ],
+        })
+        client._request_with_retry = AsyncMock(return_value=resp)
+
+        with pytest.raises(GooglePhotosError, match="Invalid") as exc_info:
+            await client._create_media_item("tok_a", "a.jpg", "album_1")
+        assert exc_info.value.body == resp.text
+
+    async def test_rejects_more_than_limit(self):
+        client = _make_client()
+        items = [(f"tok_{i}", f"{i}.jpg") for i in range(MAX_BATCH_CREATE_ITEMS + 1)]
+        with pytest.raises(ValueError):
+            await client.batch_create_media_items(items, "album_1")
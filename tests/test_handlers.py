@@ -1,20 +1,32 @@
 """Tests for bot.handlers — Telegram message handlers."""
 
+import asyncio
+from dataclasses import dataclass
+from pathlib import Path
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from bot.config import Config
 from bot.database import Database
 from bot.google_photos import GooglePhotosClient, GooglePhotosError, TokenRefreshError
-from bot.handlers import handle_media, handle_my_chat_member
+from bot.handlers import flush_media_groups, handle_my_chat_member, media_handler
 from bot.media import FileTooLargeError, MediaContent
 
 
 # ── Helpers ──────────────────────────────────────────────────────────
 
+MEDIA_DIR = Path("/nonexistent/media")
+
+
+def _media(filename: str, mime_type: str = "image/jpeg") -> MediaContent:
+    return MediaContent(
+        path=MEDIA_DIR / filename, size=1, filename=filename, mime_type=mime_type,
+    )
+
 
 def _make_config(
-    allowed_group_ids: tuple[int, ...] = (),
+    allowed_group_ids: frozenset[int] = frozenset(),
     admin_chat_id: int | None = None,
 ) -> Config:
     return Config(
@@ -30,6 +42,28 @@ def _make_config(
     )
 
 
+@dataclass
+class _Chat:
+    id: int
+    type: str
+    title: str | None
+
+
+@dataclass
+class _Message:
+    id: int
+    photo: list[object] | None
+    media_group_id: str | None = None
+    video: object | None = None
+    video_note: object | None = None
+
+
+@dataclass
+class _Update:
+    message: _Message | None
+    effective_chat: _Chat | None
+
+
 def _make_update(
     chat_id: int = -100,
     message_id: int = 1,
@@ -37,22 +71,16 @@ def _make_update(
     chat_title: str = "Test Group",
     *,
     has_photo: bool = True,
-) -> MagicMock:
-    update = MagicMock()
-    message = MagicMock()
-    message.id = message_id
-    message.photo = [MagicMock()] if has_photo else None
-    message.video = None
-    message.video_note = None
-
-    chat = MagicMock()
-    chat.id = chat_id
-    chat.type = chat_type
-    chat.title = chat_title
-
-    update.message = message
-    update.effective_chat = chat
-    return update
+    media_group_id: str | None = None,
+) -> _Update:
+    return _Update(
+        message=_Message(
+            id=message_id,
+            photo=[object()] if has_photo else None,
+            media_group_id=media_group_id,
+        ),
+        effective_chat=_Chat(id=chat_id, type=chat_type, title=chat_title),
+    )
 
 
 def _make_context(
@@ -68,63 +96,59 @@ def _make_context(
         config = _make_config()
 
     ctx = MagicMock()
-    ctx.bot_data = {"db": db, "google_photos": google_photos, "config": config}
+    ctx.bot_data = {}
     ctx.bot = AsyncMock()
+    ctx.media_callback = media_handler(db, google_photos, config).callback
     return ctx
 
 
+async def _dispatch(update: _Update, ctx: MagicMock) -> None:
+    """Run ``update`` through the media_handler() callback that _make_context built."""
+    await ctx.media_callback(update, ctx)
+
+
 # ── Tests ────────────────────────────────────────────────────────────
 
 
 class TestHandleMediaSkips:
     async def test_skips_when_no_message(self, db: Database):
-        update = MagicMock()
+        update = _make_update()
         update.message = None
-        update.effective_chat = MagicMock()
         ctx = _make_context(db)
-        await handle_media(update, ctx)  # should not raise
+        await _dispatch(update, ctx)  # should not raise
 
     async def test_skips_when_no_chat(self, db: Database):
-        update = MagicMock()
-        update.message = MagicMock()
+        update = _make_update()
         update.effective_chat = None
         ctx = _make_context(db)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
 
     async def test_skips_private_chat(self, db: Database):
         update = _make_update(chat_type="private")
         ctx = _make_context(db)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         # Should not call download
         ctx.bot.get_file.assert_not_called()
 
     async def test_skips_disallowed_group(self, db: Database):
-        config = _make_config(allowed_group_ids=(-200,))
+        config = _make_config(allowed_group_ids=frozenset({-200}))
         update = _make_update(chat_id=-100)
         ctx = _make_context(db, config=config)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         ctx.bot.get_file.assert_not_called()
 
     async def test_skips_already_processed(self, db: Database):
         await db.mark_processed(-100, 1)
         update = _make_update(chat_id=-100, message_id=1)
         ctx = _make_context(db)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         ctx.bot.get_file.assert_not_called()
 
-    async def test_skips_missing_bot_data(self, db: Database):
-        update = _make_update()
-        ctx = MagicMock()
-        ctx.bot_data = {}
-        await handle_media(update, ctx)
-
 
 class TestHandleMediaPipeline:
     @patch("bot.handlers.download_media")
     async def test_full_pipeline(self, mock_download, db: Database):
-        mock_download.return_value = MediaContent(
-            data=b"img_bytes", filename="photo.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("photo.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.get_or_create_album = AsyncMock(return_value="album_1")
         gp.upload_media = AsyncMock()
@@ -132,32 +156,43 @@ class TestHandleMediaPipeline:
         update = _make_update(chat_id=-100, message_id=42, chat_title="Vacation")
         ctx = _make_context(db, google_photos=gp)
 
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
 
         gp.upload_media.assert_called_once_with(
-            b"img_bytes", "photo.jpg", "image/jpeg", "album_1",
+            MEDIA_DIR / "photo.jpg", "photo.jpg", "image/jpeg", "album_1",
         )
         assert await db.is_processed(-100, 42)
-        assert await db.get_album_id("Vacation") == "album_1"
-        assert await db.get_chat_title(-100) == "Vacation"
+        assert db.get_album_id("Vacation") == "album_1"
+        assert db.get_chat_title(-100) == "Vacation"
 
     @patch("bot.handlers.download_media")
     async def test_uses_cached_album_id(self, mock_download, db: Database):
         await db.set_album_id("Cached", "album_cached")
-        mock_download.return_value = MediaContent(
-            data=b"x", filename="p.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("p.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.upload_media = AsyncMock()
 
         update = _make_update(chat_title="Cached")
         ctx = _make_context(db, google_photos=gp)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
 
         # Should NOT have called get_or_create_album since album is cached
         gp.get_or_create_album.assert_not_called()
         gp.upload_media.assert_called_once()
 
+    @patch("bot.handlers.download_media")
+    async def test_long_title_truncated_to_album_limit(self, mock_download, db: Database):
+        mock_download.return_value = _media("p.jpg")
+        gp = AsyncMock(spec=GooglePhotosClient)
+        gp.get_or_create_album = AsyncMock(return_value="album_1")
+
+        update = _make_update(chat_title="x" * 600)
+        ctx = _make_context(db, google_photos=gp)
+        await _dispatch(update, ctx)
+
+        gp.get_or_create_album.assert_called_once_with("x" * 500)
+        assert db.get_album_id("x" * 500) == "album_1"
+
 
 class TestHandleMediaErrors:
     @patch("bot.handlers.download_media", side_effect=Exception("network"))
@@ -166,16 +201,14 @@ class TestHandleMediaErrors:
     ):
         update = _make_update(chat_id=-100, message_id=5)
         ctx = _make_context(db)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         assert await db.is_processed(-100, 5) is False
 
     @patch("bot.handlers.download_media")
     async def test_upload_failure_does_not_mark_processed(
         self, mock_download, db: Database
     ):
-        mock_download.return_value = MediaContent(
-            data=b"x", filename="p.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("p.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.get_or_create_album = AsyncMock(return_value="album_1")
         gp.upload_media = AsyncMock(
@@ -184,7 +217,7 @@ class TestHandleMediaErrors:
 
         update = _make_update(chat_id=-100, message_id=7)
         ctx = _make_context(db, google_photos=gp)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         assert await db.is_processed(-100, 7) is False
 
     @patch(
@@ -194,14 +227,14 @@ class TestHandleMediaErrors:
     async def test_file_too_large_skips_gracefully(self, _mock, db: Database):
         update = _make_update(chat_id=-100, message_id=8)
         ctx = _make_context(db)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         assert await db.is_processed(-100, 8) is False
 
     @patch("bot.handlers.download_media", return_value=None)
     async def test_no_media_content_skips(self, _mock, db: Database):
         update = _make_update(chat_id=-100, message_id=9)
         ctx = _make_context(db)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
         assert await db.is_processed(-100, 9) is False
 
 
@@ -210,9 +243,7 @@ class TestTokenRefreshError:
     async def test_token_refresh_error_sends_admin_notification(
         self, mock_download, db: Database
     ):
-        mock_download.return_value = MediaContent(
-            data=b"x", filename="p.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("p.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.get_or_create_album = AsyncMock(return_value="album_1")
         gp.upload_media = AsyncMock(
@@ -222,7 +253,7 @@ class TestTokenRefreshError:
         config = _make_config(admin_chat_id=12345)
         update = _make_update(chat_id=-100, message_id=20)
         ctx = _make_context(db, google_photos=gp, config=config)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
 
         ctx.bot.send_message.assert_called_once()
         call_kwargs = ctx.bot.send_message.call_args
@@ -234,9 +265,7 @@ class TestTokenRefreshError:
     async def test_token_refresh_error_no_admin_chat_id(
         self, mock_download, db: Database
     ):
-        mock_download.return_value = MediaContent(
-            data=b"x", filename="p.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("p.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.get_or_create_album = AsyncMock(return_value="album_1")
         gp.upload_media = AsyncMock(
@@ -246,7 +275,7 @@ class TestTokenRefreshError:
         config = _make_config(admin_chat_id=None)
         update = _make_update(chat_id=-100, message_id=21)
         ctx = _make_context(db, google_photos=gp, config=config)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
 
         ctx.bot.send_message.assert_not_called()
         assert await db.is_processed(-100, 21) is False
@@ -255,9 +284,7 @@ class TestTokenRefreshError:
     async def test_token_refresh_error_notification_failure_does_not_crash(
         self, mock_download, db: Database
     ):
-        mock_download.return_value = MediaContent(
-            data=b"x", filename="p.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("p.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.get_or_create_album = AsyncMock(return_value="album_1")
         gp.upload_media = AsyncMock(
@@ -268,7 +295,7 @@ class TestTokenRefreshError:
         update = _make_update(chat_id=-100, message_id=22)
         ctx = _make_context(db, google_photos=gp, config=config)
         ctx.bot.send_message = AsyncMock(side_effect=Exception("Telegram down"))
-        await handle_media(update, ctx)  # should not raise
+        await _dispatch(update, ctx)  # should not raise
 
 
 class TestGroupRename:
@@ -280,26 +307,140 @@ class TestGroupRename:
         await db.set_chat_title(-100, "Old Name")
         await db.set_album_id("Old Name", "album_old")
 
-        mock_download.return_value = MediaContent(
-            data=b"x", filename="p.jpg", mime_type="image/jpeg",
-        )
+        mock_download.return_value = _media("p.jpg")
         gp = AsyncMock(spec=GooglePhotosClient)
         gp.get_or_create_album = AsyncMock(return_value="album_new")
         gp.upload_media = AsyncMock()
 
         update = _make_update(chat_id=-100, message_id=10, chat_title="New Name")
         ctx = _make_context(db, google_photos=gp)
-        await handle_media(update, ctx)
+        await _dispatch(update, ctx)
 
         # Old album cache should be deleted
-        assert await db.get_album_id("Old Name") is None
+        assert db.get_album_id("Old Name") is None
         # New album should be cached
-        assert await db.get_album_id("New Name") == "album_new"
+        assert db.get_album_id("New Name") == "album_new"
         # Chat title should be updated
-        assert await db.get_chat_title(-100) == "New Name"
+        assert db.get_chat_title(-100) == "New Name"
+        gp.invalidate_album_index.assert_called_once_with()
         gp.get_or_create_album.assert_called_once_with("New Name")
 
 
+class TestMediaGroupBatching:
+    @patch("bot.handlers.MEDIA_GROUP_DEBOUNCE_SEC", 0.1)
+    @patch("bot.handlers.download_media")
+    async def test_media_group_created_in_single_batch(
+        self, mock_download, db: Database
+    ):
+        mock_download.side_effect = [
+            _media("a.jpg"),
+            _media("b.jpg"),
+        ]
+        gp = AsyncMock(spec=GooglePhotosClient)
+        gp.get_or_create_album = AsyncMock(return_value="album_1")
+        gp.upload_file = AsyncMock(side_effect=["tok_a", "tok_b"])
+        gp.batch_create_media_items = AsyncMock(return_value=[None, None])
+
+        ctx = _make_context(db, google_photos=gp)
+        ctx.application.create_task = asyncio.ensure_future
+
+        for message_id in (30, 31):
+            update = _make_update(chat_id=-100, message_id=message_id, media_group_id="g1")
+            await _dispatch(update, ctx)
+
+        assert await db.is_processed(-100, 30) is False
+        await asyncio.sleep(0.3)
+        await flush_media_groups(ctx.bot_data)  # awaits the flush the timer started
+
+        gp.upload_media.assert_not_called()
+        gp.batch_create_media_items.assert_called_once_with(
+            [("tok_a", "a.jpg"), ("tok_b", "b.jpg")], "album_1",
+        )
+        assert await db.is_processed(-100, 30)
+        assert await db.is_processed(-100, 31)
+
+    @patch("bot.handlers.MEDIA_GROUP_DEBOUNCE_SEC", 0.1)
+    @patch("bot.handlers.download_media")
+    async def test_failed_item_not_marked_processed(
+        self, mock_download, db: Database
+    ):
+        mock_download.side_effect = [
+            _media("a.jpg"),
+            _media("b.jpg"),
+        ]
+        gp = AsyncMock(spec=GooglePhotosClient)
+        gp.get_or_create_album = AsyncMock(return_value="album_1")
+        gp.upload_file = AsyncMock(side_effect=["tok_a", "tok_b"])
+        gp.batch_create_media_items = AsyncMock(return_value=[None, "Failed"])
+
+        ctx = _make_context(db, google_photos=gp)
+        ctx.application.create_task = asyncio.ensure_future
+
+        for message_id in (40, 41):
+            update = _make_update(chat_id=-100, message_id=message_id, media_group_id="g2")
+            await _dispatch(update, ctx)
+
+        await asyncio.sleep(0.3)
+        await flush_media_groups(ctx.bot_data)  # awaits the flush the timer started
+
+        assert await db.is_processed(-100, 40)
+        assert await db.is_processed(-100, 41) is False
+
+    @patch("bot.handlers.download_media")
+    async def test_shutdown_flushes_buffered_group(self, mock_download, db: Database):
+        mock_download.side_effect = [
+            _media("a.jpg"),
+            _media("b.jpg"),
+        ]
+        gp = AsyncMock(spec=GooglePhotosClient)
+        gp.get_or_create_album = AsyncMock(return_value="album_1")
+        gp.upload_file = AsyncMock(side_effect=["tok_a", "tok_b"])
+        gp.batch_create_media_items = AsyncMock(return_value=[None, None])
+
+        ctx = _make_context(db, google_photos=gp)
+        for message_id in (50, 51):
+            update = _make_update(chat_id=-100, message_id=message_id, media_group_id="g3")
+            await _dispatch(update, ctx)
+
+        # Debounce timer is still pending; shutdown must not wait for it
+        await flush_media_groups(ctx.bot_data)
+
+        gp.batch_create_media_items.assert_called_once_with(
+            [("tok_a", "a.jpg"), ("tok_b", "b.jpg")], "album_1",
+        )
+        assert await db.is_processed(-100, 50)
+        assert await db.is_processed(-100, 51)
+        assert ctx.bot_data["media_groups"] == {}
+        ctx.application.create_task.assert_not_called()
+
+    @patch("bot.handlers.MEDIA_GROUP_DEBOUNCE_SEC", 0.01)
+    @patch("bot.handlers.download_media")
+    async def test_shutdown_awaits_flush_started_by_timer(self, mock_download, db: Database):
+        mock_download.return_value = _media("a.jpg")
+        gp = AsyncMock(spec=GooglePhotosClient)
+        gp.get_or_create_album = AsyncMock(return_value="album_1")
+        gp.upload_file = AsyncMock(return_value="tok_a")
+        created = asyncio.Event()
+
+        async def slow_batch_create(items, album_id):
+            await asyncio.sleep(0.05)
+            created.set()
+            return [None]
+
+        gp.batch_create_media_items = AsyncMock(side_effect=slow_batch_create)
+        ctx = _make_context(db, google_photos=gp)
+        ctx.application.create_task = asyncio.ensure_future
+        await _dispatch(_make_update(chat_id=-100, message_id=60, media_group_id="g4"), ctx)
+
+        # The timer fires (e.g. while Application.stop() drains updates) before shutdown flushes
+        await asyncio.sleep(0.02)
+        assert ctx.bot_data["media_groups"] == {}
+        await flush_media_groups(ctx.bot_data)
+
+        assert created.is_set()
+        assert await db.is_processed(-100, 60)
+
+
 class TestHandleMyChatMember:
     async def test_bot_removed_logs_without_error(self):
         update = MagicMock()
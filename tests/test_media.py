@@ -1,12 +1,19 @@
 """Tests for bot.media — Telegram media download with retry and size checks."""
 
+from contextlib import nullcontext
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from types import SimpleNamespace as NS
+
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock
 
 from bot.media import (
     FileTooLargeError,
     MediaContent,
     PHOTO_MAX_BYTES,
+    RETRY_BASE_DELAY_SEC,
     VIDEO_MAX_BYTES,
     _check_file_size,
     _download_with_retry,
@@ -15,45 +22,96 @@ from bot.media import (
 )
 
 
-class TestSafeFilename:
-    def test_simple_filename(self):
-        assert _safe_filename("photo.jpg", "fallback.jpg") == "photo.jpg"
+PHOTO_PAYLOAD = b"\xff\xd8"
+VIDEO_PAYLOAD = b"\x00\x00"
+VIDEO_NOTE_PAYLOAD = b"\x00"
 
-    def test_empty_returns_fallback(self):
-        assert _safe_filename("", "fallback.jpg") == "fallback.jpg"
 
-    def test_whitespace_returns_fallback(self):
-        assert _safe_filename("   ", "fallback.jpg") == "fallback.jpg"
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch) -> AsyncMock:
+    """Make download retries immediate; the returned mock records each delay."""
+    sleep = AsyncMock()
+    monkeypatch.setattr("bot.media._sleep", sleep)
+    return sleep
 
-    def test_strips_path_with_forward_slash(self):
-        assert _safe_filename("photos/image.jpg", "fallback.jpg") == "image.jpg"
 
-    def test_strips_path_with_backslash(self):
-        assert _safe_filename("photos\\image.jpg", "fallback.jpg") == "image.jpg"
+class _FakeBot:
+    """
+    Bot stub: each ``get_file`` call takes the next outcome from ``script`` (a
+    File to return or an exception to raise) and keeps using the final one once
+    the script runs out. Counts calls and remembers the last requested file_id.
+    """
 
-    def test_deep_path(self):
-        assert _safe_filename("a/b/c/photo.jpg", "fallback.jpg") == "photo.jpg"
+    def __init__(self, *script: object, local_mode: bool = False) -> None:
+        self._script = script
+        self.local_mode = local_mode
+        self.calls = 0
+        self.last_file_id: str | None = None
 
-    def test_trailing_slash_returns_fallback(self):
-        assert _safe_filename("some/path/", "fallback.jpg") == "fallback.jpg"
+    async def get_file(self, file_id: str) -> object:
+        outcome = self._script[min(self.calls, len(self._script) - 1)]
+        self.calls += 1
+        self.last_file_id = file_id
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
 
 
-class TestCheckFileSize:
-    def test_within_limit_does_not_raise(self):
-        _check_file_size(1000, 2000, "photo")  # no exception
+@dataclass(slots=True)
+class _FakeFile:
+    """Telegram File stub whose ``download_to_drive`` writes ``data`` to the requested path."""
+
+    data: bytes = b""
+    file_path: str | None = None
 
-    def test_none_size_does_not_raise(self):
-        _check_file_size(None, 2000, "photo")  # no exception
+    async def download_to_drive(self, custom_path: Path) -> Path:
+        Path(custom_path).write_bytes(self.data)
+        return Path(custom_path)
+
+
+class TestSafeFilename:
+    @pytest.mark.parametrize(
+        ("candidate", "expected"),
+        [
+            ("photo.jpg", "photo.jpg"),
+            ("", "fallback.jpg"),
+            ("   ", "fallback.jpg"),
+            ("photos/image.jpg", "image.jpg"),
+            ("photos\\image.jpg", "image.jpg"),
+            ("a/b/c/photo.jpg", "photo.jpg"),
+            ("some/path/", "fallback.jpg"),
+        ],
+        ids=["simple", "empty", "whitespace", "slash", "backslash", "deep", "trailing-slash"],
+    )
+    def test_safe_filename(self, candidate, expected):
+        assert _safe_filename(candidate, "fallback.jpg") == expected
+
+    def test_never_returns_a_path(self):
+        # Every 3-segment combination of these pieces, joined by either separator
+        segments = ["", " ", "a", "photo.jpg", "dir name"]
+        for parts in product(segments, repeat=3):
+            for sep in ("/", "\\"):
+                candidate = sep.join(parts)
+                result = _safe_filename(candidate, "fallback.jpg")
+                assert result
+                assert "/" not in result and "\\" not in result
+                assert result == "fallback.jpg" or candidate.strip().endswith(result)
 
-    def test_exactly_at_limit_does_not_raise(self):
-        _check_file_size(2000, 2000, "photo")  # no exception
 
-    def test_exceeds_limit_raises(self):
-        with pytest.raises(FileTooLargeError) as exc_info:
-            _check_file_size(3000, 2000, "photo")
-        assert exc_info.value.size_bytes == 3000
-        assert exc_info.value.limit_bytes == 2000
-        assert exc_info.value.label == "photo"
+class TestCheckFileSize:
+    @pytest.mark.parametrize(
+        ("size", "expectation"),
+        [
+            (1000, nullcontext()),
+            (None, nullcontext()),
+            (2000, nullcontext()),  # exactly at the limit
+            (3000, pytest.raises(FileTooLargeError, match=r"photo size=3000 exceeds limit=2000")),
+        ],
+        ids=["within", "unknown", "at-limit", "over"],
+    )
+    def test_check_file_size(self, size, expectation):
+        with expectation:
+            _check_file_size(size, 2000, "photo")
 
 
 class TestFileTooLargeError:
@@ -67,137 +125,138 @@ class TestFileTooLargeError:
 
 
 class TestDownloadWithRetry:
-    async def test_succeeds_first_attempt(self):
-        bot = AsyncMock()
-        tg_file = AsyncMock()
-        tg_file.download_as_bytearray.return_value = bytearray(b"data")
-        bot.get_file.return_value = tg_file
+    async def test_succeeds_first_attempt(self, tmp_path):
+        tg_file = _FakeFile(b"data")
+        bot = _FakeBot(tg_file)
+        path = tmp_path / "out"
 
-        result_file, result_data = await _download_with_retry(bot, "file_123")
+        result_file = await _download_with_retry(bot, "file_123", path)
         assert result_file is tg_file
-        assert result_data == bytearray(b"data")
-        bot.get_file.assert_called_once_with("file_123")
-
-    @patch("bot.media.RETRY_BASE_DELAY_SEC", 0)
-    async def test_retries_on_failure_then_succeeds(self):
-        bot = AsyncMock()
-        tg_file = AsyncMock()
-        tg_file.download_as_bytearray.return_value = bytearray(b"ok")
-        bot.get_file.side_effect = [Exception("network"), tg_file]
-        tg_file_mock = AsyncMock()
-        tg_file_mock.download_as_bytearray.return_value = bytearray(b"ok")
+        assert path.read_bytes() == b"data"
+        assert bot.calls == 1
+        assert bot.last_file_id == "file_123"
 
+    async def test_retries_on_failure_then_succeeds(self, tmp_path, no_sleep: AsyncMock):
         # First call raises, second succeeds
-        bot.get_file.side_effect = [Exception("network"), tg_file_mock]
+        bot = _FakeBot(Exception("network"), _FakeFile(b"ok"))
+        path = tmp_path / "out"
 
-        result_file, result_data = await _download_with_retry(bot, "file_x")
-        assert result_data == bytearray(b"ok")
-        assert bot.get_file.call_count == 2
+        await _download_with_retry(bot, "file_x", path)
+        assert path.read_bytes() == b"ok"
+        assert bot.calls == 2
+        no_sleep.assert_awaited_once_with(RETRY_BASE_DELAY_SEC)
 
-    @patch("bot.media.RETRY_BASE_DELAY_SEC", 0)
-    @patch("bot.media.MAX_DOWNLOAD_RETRIES", 2)
-    async def test_raises_after_all_retries_exhausted(self):
-        bot = AsyncMock()
-        bot.get_file.side_effect = Exception("persistent failure")
+    async def test_raises_after_all_retries_exhausted(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("bot.media.MAX_DOWNLOAD_RETRIES", 2)
+        bot = _FakeBot(Exception("persistent failure"))
 
         with pytest.raises(Exception, match="persistent failure"):
-            await _download_with_retry(bot, "file_x")
-        assert bot.get_file.call_count == 2
+            await _download_with_retry(bot, "file_x", tmp_path / "out")
+        assert bot.calls == 2
 
 
-class TestDownloadMedia:
-    def _make_message(self, *, photo=None, video=None, video_note=None):
-        msg = MagicMock()
-        msg.photo = photo
-        msg.video = video
-        msg.video_note = video_note
-        return msg
+@dataclass(frozen=True, slots=True)
+class _FakeMessage:
+    photo: list[object] | None = None
+    video: object | None = None
+    video_note: object | None = None
 
+
+class TestDownloadMedia:
     async def test_returns_none_when_no_media(self):
-        bot = AsyncMock()
-        msg = self._make_message()
+        bot = _FakeBot()
+        msg = _FakeMessage()
         result = await download_media(bot, msg)
         assert result is None
 
-    async def test_downloads_photo(self):
-        bot = AsyncMock()
-        tg_file = AsyncMock()
-        tg_file.file_path = "photos/img_001.jpg"
-        tg_file.download_as_bytearray.return_value = bytearray(b"\xff\xd8")
-        bot.get_file.return_value = tg_file
-
-        photo_size = MagicMock()
-        photo_size.file_id = "photo_id"
-        photo_size.file_size = 5000
-
-        msg = self._make_message(photo=[photo_size])
+    @pytest.mark.parametrize(
+        ("kind", "media", "file_path", "payload", "expected_name", "expected_mime"),
+        [
+            (
+                "photo", [NS(file_id="photo_id", file_size=5000)],
+                "photos/img_001.jpg", PHOTO_PAYLOAD, "img_001.jpg", "image/jpeg",
+            ),
+            (
+                "video",
+                NS(file_id="video_id", file_size=10000, file_name="holiday.mp4", mime_type="video/mp4"),
+                "videos/clip.mp4", VIDEO_PAYLOAD, "holiday.mp4", "video/mp4",
+            ),
+            (
+                "video_note", NS(file_id="vnote_id", file_size=2000),
+                "video_notes/note.mp4", VIDEO_NOTE_PAYLOAD, "note.mp4", "video/mp4",
+            ),
+        ],
+        ids=["photo", "video", "video_note"],
+    )
+    async def test_downloads_media(
+        self, kind, media, file_path, payload, expected_name, expected_mime,
+    ):
+        bot = _FakeBot(_FakeFile(payload, file_path))
+
+        msg = _FakeMessage(**{kind: media})
         result = await download_media(bot, msg)
 
         assert isinstance(result, MediaContent)
-        assert result.data == b"\xff\xd8"
-        assert result.filename == "img_001.jpg"
-        assert result.mime_type == "image/jpeg"
-
-    async def test_downloads_video(self):
-        bot = AsyncMock()
-        tg_file = AsyncMock()
-        tg_file.file_path = "videos/clip.mp4"
-        tg_file.download_as_bytearray.return_value = bytearray(b"\x00\x00")
-        bot.get_file.return_value = tg_file
-
-        video = MagicMock()
-        video.file_id = "video_id"
-        video.file_size = 10000
-        video.file_name = "holiday.mp4"
-        video.mime_type = "video/mp4"
-
-        msg = self._make_message(video=video)
-        result = await download_media(bot, msg)
-
-        assert isinstance(result, MediaContent)
-        assert result.filename == "holiday.mp4"
-        assert result.mime_type == "video/mp4"
-
-    async def test_downloads_video_note(self):
-        bot = AsyncMock()
-        tg_file = AsyncMock()
-        tg_file.file_path = "video_notes/note.mp4"
-        tg_file.download_as_bytearray.return_value = bytearray(b"\x00")
-        bot.get_file.return_value = tg_file
-
-        video_note = MagicMock()
-        video_note.file_id = "vnote_id"
-        video_note.file_size = 2000
-
-        msg = self._make_message(video_note=video_note)
-        result = await download_media(bot, msg)
-
-        assert isinstance(result, MediaContent)
-        assert result.filename == "note.mp4"
-        assert result.mime_type == "video/mp4"
+        assert result.path.read_bytes() == payload
+        assert result.size == len(payload)
+        assert result.filename == expected_name
+        assert result.mime_type == expected_mime
+
+        result.discard()
+        assert not result.path.exists()
+
+    async def test_local_server_file_used_in_place(self, tmp_path):
+        server_file = tmp_path / "videos" / "file_7.mp4"
+        server_file.parent.mkdir()
+        server_file.write_bytes(VIDEO_PAYLOAD)
+        tg_file = NS(file_path=str(server_file), download_to_drive=AsyncMock())
+        bot = _FakeBot(tg_file, local_mode=True)
+
+        result = await download_media(bot, _FakeMessage(video=NS(file_id="video_id", file_size=2)))
+
+        tg_file.download_to_drive.assert_not_awaited()
+        assert result.path == server_file
+        assert result.size == len(VIDEO_PAYLOAD)
+        assert result.filename == "file_7.mp4"
+        result.discard()
+        assert server_file.exists()
 
     async def test_raises_file_too_large_for_photo(self):
-        bot = AsyncMock()
-        photo_size = MagicMock()
-        photo_size.file_id = "photo_id"
-        photo_size.file_size = PHOTO_MAX_BYTES + 1
+        bot = _FakeBot()
+        photo_size = NS(file_id="photo_id", file_size=PHOTO_MAX_BYTES + 1)
 
-        msg = self._make_message(photo=[photo_size])
+        msg = _FakeMessage(photo=[photo_size])
         with pytest.raises(FileTooLargeError):
             await download_media(bot, msg)
 
     async def test_raises_file_too_large_for_video(self):
-        bot = AsyncMock()
-        video = MagicMock()
-        video.file_id = "video_id"
-        video.file_size = VIDEO_MAX_BYTES + 1
+        bot = _FakeBot()
+        video = NS(file_id="video_id", file_size=VIDEO_MAX_BYTES + 1)
 
-        msg = self._make_message(video=video)
+        msg = _FakeMessage(video=video)
         with pytest.raises(FileTooLargeError):
             await download_media(bot, msg)
 
+    async def test_failed_download_removes_temp_file(self, monkeypatch):
+        monkeypatch.setattr("bot.media.MAX_DOWNLOAD_RETRIES", 1)
+        created: list[Path] = []
+        bot = _FakeBot(Exception("network"))
+        real_download = _download_with_retry
+
+        async def recording_download(bot_, file_id, path):
+            created.append(path)
+            return await real_download(bot_, file_id, path)
+
+        monkeypatch.setattr("bot.media._download_with_retry", recording_download)
+        photo_size = NS(file_id="photo_id", file_size=5000)
+
+        msg = _FakeMessage(photo=[photo_size])
+        with pytest.raises(Exception, match="network"):
+            await download_media(bot, msg)
+        assert created and not created[0].exists()
+
     async def test_photo_with_empty_sizes_returns_none(self):
-        bot = AsyncMock()
-        msg = self._make_message(photo=[])
+        bot = _FakeBot()
+        msg = _FakeMessage(photo=[])
         result = await download_media(bot, msg)
         assert result is None